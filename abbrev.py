@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Abbreviates strings using an ordered list of (old,new) rules that give
+# exactly the same result as calling str.replace(old,new) for each rule
+# in turn, but in as few regex passes as possible and remembering the
+# result for every string seen
+#
+# Rules can only share a pass if the order they are applied in cannot
+# matter: no rule's old string may overlap another's, and no later old
+# string may overlap an earlier new string (which could create a new
+# match) or follow a deletion (which joins its neighbours)
+#
+# Author: Joshua A Haas
+
+import re
+
+RULE = re.compile(r'"((?:[^"\\]|\\.)*)"\s*(?:->|=|:)?\s*"((?:[^"\\]|\\.)*)"')
+
+class Abbreviator:
+  """Applies rules in as few passes as possible and memoizes results"""
+  
+  def __init__(self,rules):
+    """create a new Abbreviator from a list of (old,new) rules, ignoring
+    rules with an empty old string"""
+    
+    self.rules = [(old,new) for (old,new) in rules if old!='']
+    self.stages = getstages(self.rules)
+    self.cache = {}
+  
+  def abbrev(self,s):
+    """return s with every rule applied in order"""
+    
+    if s in self.cache:
+      return self.cache[s]
+    result = s
+    for (regex,table) in self.stages:
+      if regex is None:
+        ((old,new),) = table.items()
+        result = result.replace(old,new)
+      else:
+        result = regex.sub(lambda m: table[m.group(0)],result)
+    self.cache[s] = result
+    return result
+
+def getstages(rules):
+  """return a list of (compiled regex,{old:new}) for each group of rules
+  that can be applied in one pass, with a regex of None for single rules"""
+  
+  groups = []
+  for (old,new) in rules:
+    if (len(groups)==0) or (not canjoin(groups[-1],old)):
+      groups.append([])
+    groups[-1].append((old,new))
+  
+  stages = []
+  for group in groups:
+    table = dict(group)
+    if len(group)==1:
+      stages.append((None,table))
+    else:
+      olds = sorted(table.keys(),key=len,reverse=True)
+      stages.append((re.compile('|'.join([re.escape(o) for o in olds])),table))
+  return stages
+
+def canjoin(group,old):
+  """return whether the rule replacing old can be applied in the same
+  pass as the rules in group without changing the result"""
+  
+  for (o,n) in group:
+    if (n=='') or overlaps(o,old) or overlaps(n,old):
+      return False
+  return True
+
+def overlaps(a,b):
+  """return whether some occurrences of a and b in a string could share
+  characters"""
+  
+  if (a in b) or (b in a):
+    return True
+  for i in range(1,min(len(a),len(b))):
+    if a.endswith(b[:i]) or b.endswith(a[:i]):
+      return True
+  return False
+
+def parserules(s):
+  """return a list of (old,new) rules from the string s containing any
+  number of "old" "new" pairs, optionally separated by ->, = or :, where
+  \\" and \\\\ stand for " and \\ inside the quotes"""
+  
+  rules = []
+  for (old,new) in RULE.findall(s):
+    rules.append((unescape(old),unescape(new)))
+  return rules
+
+def unescape(s):
+  """return s with backslash escapes replaced by the escaped character"""
+  
+  return re.sub(r'\\(.)',r'\1',s)
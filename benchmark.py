@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+#
+# Benchmarks for comparing the speed of different Schedule code paths,
+# using seeded generators for sched.conf files, Rowan html and Schedules
+# so runs on different versions time exactly the same inputs
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import random,sys,os,time,json,platform,shutil,tempfile,argparse
+
+import schedule,event,meeting,schedconv
+
+SCENARIOS = (['parseconfig','parserowan','getconflicts','getlayout',
+    'place','writeascii','writehtml'])
+SIZES = [100,200,400,800]
+DENSITIES = [0.0,0.5]
+
+START_DATE = dt.date(2000,1,1)
+END_DATE = dt.date(3000,1,1)
+DURATIONS = [50,75,80,110]
+
+def randommeets(events,meets=3,density=0.5,seed=0):
+  """return a list with a list of (day,startmin,endmin) for each of
+  events with meets meetings each, where density (0 to 1) is the chance
+  that a meeting is placed to overlap an earlier one. The others are
+  put in unused 2-hour blocks from 8A to 12A while any are left, so a
+  density of 0 with at most 56 meetings never conflicts"""
+  
+  rand = random.Random(seed)
+  blocks = [(d,b) for d in range(1,6) for b in range(0,8)]
+  blocks += [(d,b) for d in (0,6) for b in range(0,8)]
+  placed = []
+  result = []
+  for i in range(0,events):
+    times = []
+    for j in range(0,meets):
+      limit = meeting.MINUTES-5
+      if (len(placed)>0) and (rand.random()<density):
+        (day,start,end) = rand.choice(placed)
+        start = rand.randint(start//5,(end-1)//5)*5
+      elif len(blocks)>0:
+        (day,b) = blocks.pop(rand.randrange(0,len(blocks)))
+        start = (8+2*b)*60+rand.choice([0,5,10,15,30])
+        limit = min(limit,(10+2*b)*60-5)
+      else:
+        day = rand.randint(0,6)
+        start = rand.randint(8*12,22*12)*5
+      end = min(start+rand.choice(DURATIONS),limit)
+      placed.append((day,start,end))
+      times.append((day,start,end))
+    result.append(times)
+  return result
+
+def randomschedule(events,meets=3,seed=0,density=0.5):
+  """return a Schedule of events Classes with meets ClassMeetings each"""
+  
+  rand = random.Random(seed)
+  sched = schedule.Schedule()
+  for (i,times) in enumerate(randommeets(events,meets,density,seed)):
+    info = ({'CRN'     : 10000+i,
+             'Course'  : 'ECE '+str(rand.randint(100,499)),
+             'Title'   : 'Course '+str(i),
+             'Campus'  : 'Main',
+             'Credits' : 3.0,
+             'Level'   : 'Undergraduate',
+             'Type'    : 'Rowan'})
+    eve = event.Class(info)
+    rows = []
+    for (day,start,end) in times:
+      rows.append({'Start Date' : START_DATE,
+                   'End Date'   : END_DATE,
+                   'Day'        : meeting.DAYS[day],
+                   'Start Time' : meeting.unpacktime(start),
+                   'End Time'   : meeting.unpacktime(end),
+                   'Location'   : 'Room '+str(rand.randint(1,50)),
+                   'Instructor' : 'Staff'})
+    eve.addmeets(meeting.ClassMeeting.frombatch(rows,eve))
+    sched.addevent(eve)
+  return sched
+
+def randomconfig(events,meets=3,seed=0,density=0.5):
+  """return the text of a sched.conf with events sections of meets
+  meetings each"""
+  
+  rand = random.Random(seed)
+  lines = []
+  for (i,times) in enumerate(randommeets(events,meets,density,seed)):
+    lines.append('[Event '+str(i)+']')
+    lines.append('dates = '+START_DATE.strftime('%Y/%m/%d')+'-'
+        +END_DATE.strftime('%Y/%m/%d'))
+    lines.append('meets = '+' '.join([meeting.DAYS[day]+'('+config_gettime(start)
+        +'-'+config_gettime(end)+')' for (day,start,end) in times]))
+    lines.append('location = Room '+str(rand.randint(1,50)))
+    lines.append('')
+  return '\n'.join(lines)
+
+def config_gettime(mins):
+  """return mins after midnight in the 24-hr sched.conf format"""
+  
+  return str(mins//60)+':'+str(mins%60).zfill(2)
+
+def randomrowan(classes,meets=2,seed=0,density=0.5):
+  """return the html of a Rowan concise student schedule page with
+  classes courses of meets meetings each"""
+  
+  rand = random.Random(seed)
+  lines = ['<html><body>']
+  lines.append('<table CLASS="datadisplaytable" summary="This layout table '
+      +'is used to present the schedule course detail">')
+  lines.append('<caption class="captiontext">Display course details for '
+      +'a student.</caption>')
+  lines.append(rowan_getrow(schedconv.COLUMNS,'th'))
+  for (i,times) in enumerate(randommeets(classes,meets,density,seed)):
+    course = ([str(40000+i),'ECE 09.'+str(rand.randint(100,499)),
+        '<a href="?crn='+str(40000+i)+'">Course &amp; Lab '+str(i)+'</a>',
+        'Glassboro','3.000','Undergraduate'])
+    for (j,(day,start,end)) in enumerate(times):
+      if j>0:
+        course = ['&nbsp;']*schedconv.EVENT_COLS
+      cells = course+([START_DATE.strftime('%b %d, %Y'),
+          END_DATE.strftime('%b %d, %Y'),meeting.DAYS[day],
+          rowan_gettime(start)+' - '+rowan_gettime(end),
+          'Robinson Hall '+str(rand.randint(100,300)),'Smith, John'])
+      lines.append(rowan_getrow(cells,'td'))
+  lines.append(rowan_getrow(['Total Credits'],'td'))
+  lines.append('</table>')
+  lines.append('</body></html>')
+  return '\n'.join(lines)
+
+def rowan_gettime(mins):
+  """return mins after midnight in the Rowan format like 2:00 pm"""
+  
+  (hr,mi) = (mins//60,mins%60)
+  ampm = 'am'
+  if hr>=12:
+    ampm = 'pm'
+  return str(schedconv.twelvehr(hr))+':'+str(mi).zfill(2)+' '+ampm
+
+def rowan_getrow(cells,cell):
+  """return a Rowan table row of cells using the tag cell"""
+  
+  return '<tr>'+''.join(['<'+cell+' CLASS="dddefault">'+c+'</'+cell+'>'
+      for c in cells])+'</tr>'
+
+def timeit(func,*args):
+  """return (seconds,result) of calling func with args"""
+  
+  start = time.time()
+  result = func(*args)
+  return (time.time()-start,result)
+
+def repeatit(repeat,func,*args):
+  """return ([seconds,...],result) of calling func with args repeat times"""
+  
+  times = []
+  result = None
+  for i in range(0,repeat):
+    (t,result) = timeit(func,*args)
+    times.append(t)
+  return (times,result)
+
+def record(scenario,size,density,times,**extra):
+  """return a result dict for one timed scenario"""
+  
+  result = ({'scenario' : scenario,
+             'size'     : size,
+             'density'  : density,
+             'repeat'   : len(times),
+             'best'     : min(times),
+             'mean'     : sum(times)/len(times)})
+  result.update(extra)
+  return result
+
+def bench(sizes=None,densities=None,scenarios=None,repeat=3,meets=3,seed=0):
+  """return a list of result dicts from running each of scenarios for
+  each of sizes (number of events) and densities"""
+  
+  sizes = sizes or SIZES
+  densities = densities or DENSITIES
+  scenarios = scenarios or SCENARIOS
+  tmp = tempfile.mkdtemp(prefix='schedbench')
+  results = []
+  try:
+    for size in sizes:
+      for density in densities:
+        for scenario in scenarios:
+          func = globals()['bench_'+scenario]
+          results += func(tmp,size,density,repeat,meets,seed)
+  finally:
+    shutil.rmtree(tmp)
+  return results
+
+def bench_parseconfig(tmp,size,density,repeat,meets,seed):
+  """time schedconv.parseconfig() on a generated sched.conf"""
+  
+  fname = os.path.join(tmp,'sched.conf')
+  writefile(randomconfig(size,meets,seed,density),fname)
+  (times,sched) = repeatit(repeat,schedconv.parseconfig,fname)
+  return [record('parseconfig',size,density,times,
+      meets=len(sched.getallmeets()))]
+
+def bench_parserowan(tmp,size,density,repeat,meets,seed):
+  """time schedconv.parserowan() on generated Rowan html"""
+  
+  fname = os.path.join(tmp,'rowan.html')
+  writefile(randomrowan(size,meets,seed,density),fname)
+  (times,sched) = repeatit(repeat,schedconv.parserowan,fname)
+  return [record('parserowan',size,density,times,
+      meets=len(sched.getallmeets()))]
+
+def bench_getconflicts(tmp,size,density,repeat,meets,seed):
+  """time Schedule.getconflicts() with each engine"""
+  
+  sched = randomschedule(size,meets,seed,density)
+  results = []
+  for engine in schedule.ENGINES:
+    (times,conflicts) = repeatit(repeat,sched.getconflicts,engine)
+    results.append(record('getconflicts',size,density,times,engine=engine,
+        meets=len(sched.getallmeets()),conflicts=len(conflicts)))
+  return results
+
+def bench_getlayout(tmp,size,density,repeat,meets,seed):
+  """time schedconv.getlayout() (including sync) on the largest
+  conflict-free schedule with at most size events it can lay out, which
+  is only done for a density of 0"""
+  
+  if density>0:
+    return []
+  (sched,events) = getlayoutschedule(size,meets,seed)
+  logfile = os.path.join(tmp,'sched.log')
+  (times,_) = repeatit(repeat,schedconv.getlayout,sched,logfile)
+  return [record('getlayout',events,0.0,times,meets=len(sched.getallmeets()))]
+
+def bench_place(tmp,size,density,repeat,meets,seed):
+  """time layout.place() through schedconv.getgridlayout()"""
+  
+  sched = randomschedule(size,meets,seed,density)
+  (times,lay) = repeatit(repeat,schedconv.getgridlayout,sched,{})
+  return [record('place',size,density,times,meets=len(sched.getallmeets()),
+      columns=max(lay.columns))]
+
+def bench_writeascii(tmp,size,density,repeat,meets,seed):
+  """time schedconv.writeascii() for the table and grid layouts"""
+  
+  fname = os.path.join(tmp,'sched-ascii.txt')
+  results = []
+  for (name,table,borders,events) in getlayouts(size,density,meets,seed):
+    (times,_) = repeatit(repeat,schedconv.writeascii,table,borders,fname)
+    results.append(record('writeascii',events,density,times,layout=name,
+        bytes=os.path.getsize(fname)))
+  return results
+
+def bench_writehtml(tmp,size,density,repeat,meets,seed):
+  """time schedconv.writehtml() for the table and grid layouts"""
+  
+  fname = os.path.join(tmp,'sched.html')
+  results = []
+  for (name,table,borders,events) in getlayouts(size,density,meets,seed):
+    (times,_) = repeatit(repeat,schedconv.writehtml,table,{},fname)
+    results.append(record('writehtml',events,density,times,layout=name,
+        bytes=os.path.getsize(fname)))
+  return results
+
+def getlayoutschedule(size,meets,seed):
+  """return (Schedule,events) for the largest conflict-free schedule of
+  at most size events that fits in the fixed table layout"""
+  
+  events = max(1,min(size,56//meets))
+  return (randomschedule(events,meets,seed,0.0),events)
+
+def getlayouts(size,density,meets,seed):
+  """return [(name,table,borders,events),...] for the grid layout of a
+  generated schedule, and for a density of 0 also the table layout"""
+  
+  layouts = []
+  if density==0:
+    (sched,events) = getlayoutschedule(size,meets,seed)
+    (table,borders) = schedconv.getlayout(sched,os.devnull)
+    layouts.append(('table',table,borders,events))
+  sched = randomschedule(size,meets,seed,density)
+  layouts.append(('grid',schedconv.getgridlayout(sched,{}),None,size))
+  return layouts
+
+def writefile(text,fname):
+  """write text to fname"""
+  
+  f = open(fname,'w')
+  try:
+    f.write(text)
+  finally:
+    f.close()
+
+def report(results,fname=None):
+  """write results with details about this machine as JSON to fname or
+  print them if fname is None"""
+  
+  doc = ({'python'   : platform.python_version(),
+          'platform' : platform.platform(),
+          'time'     : dt.datetime.now().isoformat(),
+          'results'  : results})
+  text = json.dumps(doc,indent=2,sort_keys=True)
+  if fname is None:
+    print text
+  else:
+    writefile(text+'\n',fname)
+
+def compare(oldfile,newfile):
+  """print the ratio of new to old best times for results in both of the
+  JSON reports oldfile and newfile"""
+  
+  reports = []
+  for fname in (oldfile,newfile):
+    f = open(fname)
+    try:
+      reports.append(json.load(f)['results'])
+    finally:
+      f.close()
+  
+  old = dict([(getkey(r),r) for r in reports[0]])
+  print 'scenario          size  density  variant     old (s)     new (s)  ratio'
+  for r in reports[1]:
+    key = getkey(r)
+    if key not in old:
+      continue
+    ratio = r['best']/max(old[key]['best'],1e-9)
+    print (key[0].ljust(16)+str(key[1]).rjust(6)+('%.2f' % key[2]).rjust(9)
+        +'  '+key[3].ljust(8)+('%.5f' % old[key]['best']).rjust(12)
+        +('%.5f' % r['best']).rjust(12)+('%.2f' % ratio).rjust(7))
+
+def getkey(result):
+  """return a tuple identifying what a result timed"""
+  
+  variant = result.get('engine',result.get('layout',''))
+  return (result['scenario'],result['size'],result['density'],variant)
+
+def benchconflicts(sizes=None):
+  """compare Schedule.getconflicts() engines on random schedules"""
+  
+  if sizes is None:
+    sizes = SIZES
+  
+  print 'events  meets  conflicts  '+'  '.join([e.rjust(9) for e in schedule.ENGINES])
+  for size in sizes:
+    sched = randomschedule(size)
+    times = []
+    results = []
+    for engine in schedule.ENGINES:
+      (t,result) = timeit(sched.getconflicts,engine)
+      times.append(t)
+      results.append(result)
+    for result in results[1:]:
+      if result!=results[0]:
+        raise RuntimeError('Conflict engines disagree for size '+str(size))
+    print (str(size).rjust(6)+str(len(sched.getallmeets())).rjust(7)
+        +str(len(results[0])).rjust(11)+'  '
+        +'  '.join([('%.4f' % t).rjust(9) for t in times]))
+
+def main(args=None):
+  """parse command line arguments and run"""
+  
+  parser = argparse.ArgumentParser(description='Benchmark schedule code paths')
+  parser.add_argument('sizes',nargs='*',type=int,
+      help='numbers of events to generate (default: '+str(SIZES)+')')
+  parser.add_argument('-d','--density',type=float,action='append',
+      help='chance each meeting overlaps another (repeatable)')
+  parser.add_argument('-s','--scenario',choices=SCENARIOS,action='append',
+      help='scenario to run (repeatable, default: all)')
+  parser.add_argument('-r','--repeat',type=int,default=3,
+      help='number of times to time each scenario')
+  parser.add_argument('-o','--output',
+      help='file to write the JSON results to (default: print them)')
+  parser.add_argument('-c','--compare',nargs=2,metavar=('OLD','NEW'),
+      help='compare two JSON result files instead of running')
+  parser.add_argument('-e','--engines',action='store_true',
+      help='print a table comparing the conflict engines instead')
+  args = parser.parse_args(args)
+  
+  if args.compare is not None:
+    compare(*args.compare)
+  elif args.engines:
+    benchconflicts(args.sizes or None)
+  else:
+    results = bench(args.sizes,args.density,args.scenario,args.repeat)
+    report(results,args.output)
+
+if __name__ == '__main__':
+  main()
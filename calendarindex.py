@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+#
+# An index of the dates and times at which the meetings of a Schedule
+# occur, for answering "what happens on this date" or "what overlaps
+# these hours" without scanning every meeting
+#
+# Each day has one tree of the ordinals of the first and last occurrence
+# of its meetings and one of the minutes they start and end at, where a
+# meeting that ends at or before it starts lasts until midnight
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+
+import meeting
+from intervaltree import IntervalTree
+
+FIRST = dt.date.min.toordinal()
+LAST = dt.date.max.toordinal()
+
+class CalendarIndex:
+  
+  def __init__(self,sched=None):
+    """create a new CalendarIndex of the meetings in sched"""
+    
+    self.trees = [IntervalTree() for d in meeting.DAYS]
+    self.times = [IntervalTree() for d in meeting.DAYS]
+    self.events = {}
+    if sched is not None:
+      for eve in sched.events:
+        self.addevent(eve)
+  
+  def add(self,meet,eve=None):
+    """add the meeting.Meeting meet of eve (meet.event by default) to
+    the index"""
+    
+    if eve is None:
+      eve = meet.event
+    self.events.setdefault(id(eve),[]).append(meet)
+    if meet.getnummeets()>0:
+      self.trees[meet.day].insert(meet.getfirstord(),meet.getlastord(),meet)
+      self.times[meet.day].insert(meet.startmin,getstop(meet.startmin,meet.endmin)-1,meet)
+  
+  def remove(self,meet,eve=None):
+    """remove the meeting.Meeting meet of eve (meet.event by default)
+    from the index"""
+    
+    if eve is None:
+      eve = meet.event
+    meets = self.events.get(id(eve),[])
+    self.events[id(eve)] = [m for m in meets if m is not meet]
+    self.trees[meet.day].remove(meet)
+    self.times[meet.day].remove(meet)
+  
+  def addevent(self,eve):
+    """add all the meetings of the event.Event eve to the index"""
+    
+    for meet in eve.meets:
+      self.add(meet,eve)
+  
+  def removeevent(self,eve):
+    """remove all the meetings of the event.Event eve from the index"""
+    
+    for meet in self.events.pop(id(eve),[]):
+      self.trees[meet.day].remove(meet)
+      self.times[meet.day].remove(meet)
+  
+  def updateevent(self,eve):
+    """re-index eve after meetings have been removed from it"""
+    
+    self.removeevent(eve)
+    self.addevent(eve)
+  
+  def ondate(self,date):
+    """return the meetings occuring on the dt.date date"""
+    
+    o = date.toordinal()
+    return self.trees[o%7].overlap(o,o)
+  
+  def between(self,start,end):
+    """return the meetings occuring at least once from the dt.date start
+    to the dt.date end sorted by day"""
+    
+    meets = []
+    for day in range(0,7):
+      meets += self.ondays(day,start.toordinal(),end.toordinal())
+    return meets
+  
+  def ondays(self,day,lo,hi):
+    """return the meetings on day (an index into meeting.DAYS) occuring
+    at least once from the ordinal lo to the ordinal hi"""
+    
+    (first,last) = getdays(day,lo,hi)
+    if first>last:
+      return []
+    return self.trees[day].overlap(first,last)
+  
+  def query(self,day=None,start=None,end=None,first=None,last=None):
+    """return the meetings on day (one of meeting.DAYS, default any day)
+    that overlap the dt.times start to end (or are in progress at start
+    if there is no end) and occur at least once from the dt.date first to
+    the dt.date last, ignoring missing bounds, sorted by day and time
+    
+    With both times and dates, the matches of each in its tree are
+    counted and only the tree with fewer is searched, checking its
+    matches against the other bounds directly, so each day takes
+    O(log n + min(a,b)) where a and b are the numbers of meetings on it
+    matching the times alone and the dates alone"""
+    
+    if day is None:
+      days = range(0,7)
+    else:
+      days = [meeting.DAYS.index(day)]
+    if (start is not None) or (end is not None):
+      (lo,hi) = gettimes(start,end)
+    dates = (first is not None) or (last is not None) or (start is None and end is None)
+    (firstord,lastord) = (FIRST,LAST)
+    if first is not None:
+      firstord = first.toordinal()
+    if last is not None:
+      lastord = last.toordinal()
+    
+    meets = []
+    for d in days:
+      if (start is None) and (end is None):
+        meets += self.ondays(d,firstord,lastord)
+        continue
+      if not dates:
+        meets += self.times[d].overlap(lo,hi)
+        continue
+      (dlo,dhi) = getdays(d,firstord,lastord)
+      if dlo>dhi:
+        continue
+      if self.times[d].count(lo,hi)<=self.trees[d].count(dlo,dhi):
+        matches = self.times[d].overlap(lo,hi)
+        meets += [m for m in matches if (m.getfirstord()<=dhi) and (m.getlastord()>=dlo)]
+      else:
+        matches = self.trees[d].overlap(dlo,dhi)
+        meets += [m for m in matches if (m.startmin<=hi)
+            and (getstop(m.startmin,m.endmin)>lo)]
+    meets.sort(key=(lambda m: (m.day,m.startmin)))
+    return meets
+  
+  def occurrences(self,start,end):
+    """generate (start,end,meet) for each occurrence from the dt.date
+    start to the dt.date end in order of start time"""
+    
+    return meeting.mergeoccurrences(self.between(start,end),start,end)
+
+def getdays(day,lo,hi):
+  """return the ordinals (first,last) of the first and last dates on day
+  (an index into meeting.DAYS) from the ordinal lo to the ordinal hi,
+  where first>last if there are none"""
+  
+  # Only dates on this day can match since intervals start and end
+  # on an occurrence and occurrences are exactly a week apart
+  return (lo+(day-lo%7)%7,hi-(hi%7-day)%7)
+
+def getstop(startmin,endmin):
+  """return the minute a meeting from startmin to endmin stops at, which
+  is midnight if it ends at or before it starts"""
+  
+  if endmin>startmin:
+    return endmin
+  return meeting.MINUTES
+
+def gettimes(start,end):
+  """return the closed range (lo,hi) of minutes to look for meetings in
+  for the dt.times start and end, either of which may be None"""
+  
+  if end is None:
+    lo = meeting.packtime(start)
+    return (lo,lo)
+  lo = 0
+  if start is not None:
+    lo = meeting.packtime(start)
+  return (lo,getstop(lo,meeting.packtime(end))-1)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+#
+# A column cache of the meetings of a Schedule for scans, with one row
+# per meeting kept in parallel arrays (event, day, times, dates and
+# interned strings), so filters, sorts and conflict scans run over
+# contiguous memory instead of walking events and meetings
+#
+# The cache is made from a Schedule and kept next to its Meeting objects,
+# which stay the only copy of the data: it costs about 30 bytes per row
+# plus each distinct string, and rows are turned back into the Meetings
+# themselves. Rows are numbered in the order of Schedule.getallmeets()
+# (Uses numpy for filters and sorts if available)
+#
+# Author: Joshua A Haas
+
+import array
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+import meeting
+
+# Each column and its array typecode, which numpy also understands
+COLUMNS = ([('event','i'),
+            ('day','b'),
+            ('startmin','h'),
+            ('endmin','h'),
+            ('startord','i'),
+            ('endord','i'),
+            ('location','i'),
+            ('instructor','i')])
+
+# The column each packed slot of a meeting.Meeting is stored in, with
+# string slots stored as ids in the string table
+SLOTS = ({ 'day'        : ('day',False),
+           'startmin'   : ('startmin',False),
+           'endmin'     : ('endmin',False),
+           'startord'   : ('startord',False),
+           'endord'     : ('endord',False),
+           'location'   : ('location',True),
+           'instructor' : ('instructor',True) })
+
+class Columns:
+  
+  def __init__(self,sched=None):
+    """create a new Columns cache of all the meetings in sched"""
+    
+    self.cols = dict([(name,array.array(code)) for (name,code) in COLUMNS])
+    self.meets = []
+    self.numevents = 0
+    self.strings = []
+    self.ids = {}
+    if sched is not None:
+      for eve in sched.events:
+        self.addevent(eve)
+  
+  def __len__(self):
+    """return the number of rows"""
+    
+    return len(self.cols['day'])
+  
+  def addevent(self,eve):
+    """add a row for each meeting of the event.Event eve"""
+    
+    for meet in eve.meets:
+      self.addmeet(meet,self.numevents)
+    self.numevents += 1
+  
+  def addmeet(self,meet,i):
+    """add a row for the meeting.Meeting meet of the event with index i"""
+    
+    cols = self.cols
+    self.meets.append(meet)
+    cols['event'].append(i)
+    for (slot,(name,isstr)) in SLOTS.items():
+      value = getattr(meet,slot,None)
+      if isstr:
+        value = self.addstring(value)
+      cols[name].append(value)
+  
+  def addstring(self,s):
+    """return the id of s in the string table, or -1 for None"""
+    
+    if s is None:
+      return -1
+    key = (type(s),s)
+    if key not in self.ids:
+      self.ids[key] = len(self.strings)
+      self.strings.append(s)
+    return self.ids[key]
+  
+  def getstring(self,i):
+    """return the string with id i, or None for -1"""
+    
+    if i<0:
+      return None
+    return self.strings[i]
+  
+  def getcolumn(self,name):
+    """return the column name as a numpy array sharing the same memory if
+    numpy is available, else as an array.array"""
+    
+    col = self.cols[name]
+    if np is None:
+      return col
+    return np.frombuffer(col,dtype=col.typecode)
+  
+  def getmeet(self,row):
+    """return the meeting.Meeting of row"""
+    
+    return self.meets[row]
+  
+  def getmeets(self,rows=None):
+    """return the meeting.Meetings of rows, or of all rows if not
+    specified"""
+    
+    if rows is None:
+      return list(self.meets)
+    return [self.meets[row] for row in rows]
+  
+  def filter(self,event=None,day=None,start=None,end=None,time=None,
+      location=None,instructor=None):
+    """return the sorted rows of the event with index event that meet on
+    day (one of meeting.DAYS) between the dt.dates start and end, in
+    progress at the dt.time time (where meetings ending at or before they
+    start run until midnight), at location with instructor, ignoring any
+    criteria that are not specified"""
+    
+    tests = []
+    if event is not None:
+      tests.append(('event','==',event))
+    if day is not None:
+      tests.append(('day','==',meeting.DAYS.index(day)))
+    if start is not None:
+      tests.append(('endord','>=',start.toordinal()))
+    if end is not None:
+      tests.append(('startord','<=',end.toordinal()))
+    if time is not None:
+      minute = meeting.packtime(time)
+      tests.append(('startmin','<=',minute))
+      tests.append(('endmin','until',minute))
+    for (name,s) in [('location',location),('instructor',instructor)]:
+      if s is not None:
+        tests.append((name,'==',self.ids.get((type(s),s),-2)))
+    
+    if np is not None:
+      return filternumpy(self,tests)
+    return filterarrays(self,tests)
+  
+  def sort(self,rows=None,keys=None):
+    """return rows (default all) sorted by the columns keys (default day
+    then start time), keeping the order of rows with equal keys"""
+    
+    if rows is None:
+      rows = range(0,len(self))
+    if keys is None:
+      keys = ['day','startmin']
+    if np is not None:
+      rows = np.asarray(rows,dtype=np.intp)
+      cols = [self.getcolumn(key)[rows] for key in reversed(keys)]
+      return [int(r) for r in rows[np.lexsort(cols)]]
+    cols = [self.cols[key] for key in keys]
+    return sorted(rows,key=(lambda r: tuple([col[r] for col in cols])))
+  
+  def getconflicts(self):
+    """return a sorted list of (row,row) pairs of conflicting meetings by
+    sweeping each day in order of start time, which gives the same pairs
+    as Schedule.getconflicts() for the Schedule this cache was made from"""
+    
+    cols = self.cols
+    (day,startmin,endmin) = (cols['day'],cols['startmin'],cols['endmin'])
+    (startord,endord) = (cols['startord'],cols['endord'])
+    
+    # Meetings that end at or before they start (e.g. at midnight) are
+    # not intervals and are compared directly using Meeting.conflicts()
+    days = {}
+    odd = {}
+    for r in self.sort():
+      if startmin[r]<endmin[r]:
+        days.setdefault(day[r],[]).append(r)
+      else:
+        odd.setdefault(day[r],[]).append(r)
+    
+    pairs = []
+    for rows in days.values():
+      active = []
+      for r in rows:
+        active = [a for a in active if endmin[a]>startmin[r]]
+        for a in active:
+          if (endord[a]>=startord[r]) and (startord[a]<=endord[r]):
+            pairs.append((min(a,r),max(a,r)))
+        active.append(r)
+    
+    for (d,rows) in odd.items():
+      others = rows+days.get(d,[])
+      for r in rows:
+        for o in others:
+          if (r!=o) and ((o>r) or (startmin[o]<endmin[o])):
+            (i,j) = (min(r,o),max(r,o))
+            if self.getmeet(i).conflicts(self.getmeet(j)):
+              pairs.append((i,j))
+    
+    pairs.sort()
+    return pairs
+
+def filternumpy(store,tests):
+  """return the sorted rows of store passing every (column,op,value)
+  test using numpy masks, where "until" passes end times after value or
+  at or before the start time (i.e. running until midnight)"""
+  
+  mask = np.ones(len(store),dtype=bool)
+  for (name,op,value) in tests:
+    col = store.getcolumn(name)
+    if op=='==':
+      mask &= (col==value)
+    elif op=='<=':
+      mask &= (col<=value)
+    elif op=='>=':
+      mask &= (col>=value)
+    elif op=='until':
+      mask &= ((col>value) | (col<=store.getcolumn('startmin')))
+    else:
+      mask &= (col>value)
+  return [int(r) for r in np.flatnonzero(mask)]
+
+def filterarrays(store,tests):
+  """return the sorted rows of store passing every (column,op,value)
+  test by scanning the arrays, see filternumpy()"""
+  
+  rows = xrange(0,len(store))
+  for (name,op,value) in tests:
+    col = store.cols[name]
+    if op=='==':
+      rows = [r for r in rows if col[r]==value]
+    elif op=='<=':
+      rows = [r for r in rows if col[r]<=value]
+    elif op=='>=':
+      rows = [r for r in rows if col[r]>=value]
+    elif op=='until':
+      start = store.cols['startmin']
+      rows = [r for r in rows if (col[r]>value) or (col[r]<=start[r])]
+    else:
+      rows = [r for r in rows if col[r]>value]
+  return list(rows)
@@ -4,18 +4,17 @@
 #
 # Author: Joshua A Haas
 
-import util
-
 import meeting
 
 class Event:
   
+  FIELDS = ({ 'Title' : str,
+              'Type'  : str })
+  
   def __init__(self,info,meets=None):
     """create a new Elass with the given info"""
     
-    self.FIELDS = ({ 'Title' : str,
-                     'Type'  : str })
-    
+    self.scheds = []
     self.initinfo(info)
     self.initmeets(meets)
   
@@ -32,16 +31,16 @@ class Event:
   def initinfo(self,info):
     """initialize info dict"""
     
-    self.info = util.blankdict(self.FIELDS.keys())
-    util.checkdict(info,self.FIELDS.keys())
-    self.importinfo(info)
+    meeting.checkfields(info,self.FIELDS)
+    self.info = dict.fromkeys(self.FIELDS)
+    self.info.update(info)
 
   def initmeets(self,meets):
     """initialize meets list"""
     
     self.meets = []
     if meets is not None:
-      self.meets = self.addmeets(meets)
+      self.addmeets(meets)
   
   def getinfo(self,field=None):
     """return the requested info, or the entire dict if not specified"""
@@ -53,7 +52,8 @@ class Event:
   def importinfo(self,info):
     """import info from the dict info into this class"""
     
-    self.info = util.updatedict(self.info,info)
+    meeting.checkfields(info,self.FIELDS)
+    self.info.update(info)
 
   def getmeetinds(self,search=None):
     """return the meeting that matches the search criteria, or
@@ -85,6 +85,8 @@ class Event:
     if not issubclass(meet.__class__,meeting.Meeting):
       raise TypeError('Input must be subclass of Meeting')
     self.meets.append(meet)
+    for sched in self.scheds:
+      sched.meetadded(self,meet)
   
   def addmeets(self,meets):
     """add several meeting times for this Event"""
@@ -107,6 +109,14 @@ class Event:
       matches.sort(reverse=True)
       for ind in matches:
         del self.meets[ind]
+    for sched in self.scheds:
+      sched.meetsremoved(self)
+
+  def occurrences(self,start=None,end=None):
+    """generate (start,end,meet) for each time one of this Event's
+    meetings occurs from the dt.date start to the dt.date end"""
+    
+    return meeting.mergeoccurrences(self.meets,start,end)
 
   def conflicts(self,other):
     """return whether this event has any conflicts with other"""
@@ -126,19 +136,13 @@ class Event:
 
 class Class(Event):
   
-  def __init__(self,info,meets=None):
-    """create a new Class with the given info"""
-    
-    self.FIELDS = ({ 'CRN'        : int,
-                     'Course'     : str,
-                     'Title'      : str,
-                     'Campus'     : str,
-                     'Credits'    : float,
-                     'Level'      : str,
-                     'Type'       : str })
-    
-    self.initinfo(info)
-    self.initmeets(meets)
+  FIELDS = ({ 'CRN'        : int,
+              'Course'     : str,
+              'Title'      : str,
+              'Campus'     : str,
+              'Credits'    : float,
+              'Level'      : str,
+              'Type'       : str })
   
   def __eq__(self,obj):
     """override == operator"""
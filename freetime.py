@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Find the times when several people (each with a Schedule) are free by
+# sweeping over their merged, sorted busy intervals
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+
+def findfree(scheds,start,end,duration,daystart=None,dayend=None,minimum=None):
+  """return a list of (start,end,available) for the free times of at
+  least duration (a dt.timedelta) from the dt.date start to the dt.date
+  end, only between the dt.times daystart and dayend on each day if
+  specified, where available is the list of indices into scheds of the
+  participants who are free for that whole time. Only times when at
+  least minimum participants (default all of them) are free are given.
+  The list is sorted by most available participants, then by time."""
+  
+  if minimum is None:
+    minimum = len(scheds)
+  
+  # Boundaries are (time,order,change,participant) where order makes
+  # windows close and people become free before the opposite happens
+  bounds = []
+  for (ws,we) in getwindows(start,end,daystart,dayend):
+    bounds.append((ws,1,'open',None))
+    bounds.append((we,0,'close',None))
+  for (p,sched) in enumerate(scheds):
+    for (bs,be) in getbusy(sched,start,end):
+      bounds.append((bs,1,'busy',p))
+      bounds.append((be,0,'free',p))
+  bounds.sort()
+  
+  # Sweep the boundaries keeping the set of free participants up to date
+  # and join neighbouring segments with the same available participants,
+  # only listing them again after the set has changed
+  segments = []
+  free = set(range(0,len(scheds)))
+  available = None
+  inwindow = False
+  prev = None
+  for (t,order,change,p) in bounds:
+    if inwindow and (prev is not None) and (t>prev) and (len(free)>=minimum):
+      if available is None:
+        available = sorted(free)
+      if (len(segments)>0 and segments[-1][1]==prev
+          and (segments[-1][2] is available or segments[-1][2]==available)):
+        segments[-1] = (segments[-1][0],t,segments[-1][2])
+      else:
+        segments.append((prev,t,available))
+    prev = t
+    if change=='open':
+      inwindow = True
+    elif change=='close':
+      inwindow = False
+    elif change=='busy':
+      free.discard(p)
+      available = None
+    else:
+      free.add(p)
+      available = None
+  
+  times = [(s,e,a) for (s,e,a) in segments if e-s>=duration]
+  times.sort(key=(lambda x: (-len(x[2]),x[0])))
+  return times
+
+def getwindows(start,end,daystart=None,dayend=None):
+  """return a list of (start,end) dt.datetimes for each day from the
+  dt.date start to the dt.date end limited by the dt.times daystart and
+  dayend; a dayend of None or midnight means the end of the day"""
+  
+  if daystart is None:
+    daystart = dt.time(0)
+  windows = []
+  date = start
+  while date<=end:
+    ws = dt.datetime.combine(date,daystart)
+    if (dayend is None) or (dayend==dt.time(0)):
+      we = dt.datetime.combine(date+dt.timedelta(days=1),dt.time(0))
+    else:
+      we = dt.datetime.combine(date,dayend)
+    if we>ws:
+      windows.append((ws,we))
+    date += dt.timedelta(days=1)
+  return windows
+
+def getbusy(sched,start,end):
+  """return the sorted, disjoint (start,end) dt.datetimes when sched has
+  a meeting from the dt.date start to the dt.date end"""
+  
+  # Start a day early for meetings that run past midnight into start
+  busy = []
+  for (s,e,meet) in sched.occurrences(start-dt.timedelta(days=1),end):
+    if (len(busy)>0) and (s<=busy[-1][1]):
+      if e>busy[-1][1]:
+        busy[-1] = (busy[-1][0],e)
+    else:
+      busy.append((s,e))
+  return busy
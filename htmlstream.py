@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#
+# Writes html to a file-like sink one line at a time, keeping track of
+# the indentation instead of building and re-indenting nested lists of
+# lines, with the same output as htmlwriter's tag() and tab()
+#
+# Author: Joshua A Haas
+
+from htmlwriter import tab,tag
+
+MARK = '\0'
+
+def gettag(name):
+  """return ([opening lines],[closing lines]) that tag() puts around its
+  content for the tag name"""
+  
+  lines = tag(name,[MARK])
+  i = lines.index(MARK)
+  return (lines[:i],lines[i+1:])
+
+def getindent():
+  """return the string tab() puts before every line"""
+  
+  line = tab([MARK])[0]
+  return line[:line.index(MARK)]
+
+class HtmlStream:
+  """Writes lines to f, each followed by a newline and indented by one
+  tab() for every tag opened by open() and not yet closed by close()"""
+  
+  def __init__(self,f):
+    """create a new HtmlStream writing to the file-like object f"""
+    
+    self.f = f
+    self.indent = ''
+    self.step = getindent()
+    self.closing = []
+    self.tags = {}
+  
+  def write(self,line):
+    """write one line at the current indentation"""
+    
+    self.f.write(self.indent+line+'\n')
+  
+  def writelines(self,lines):
+    """write each of lines at the current indentation"""
+    
+    for line in lines:
+      self.write(line)
+  
+  def open(self,name):
+    """write the opening of the tag name and indent following lines"""
+    
+    if name not in self.tags:
+      self.tags[name] = gettag(name)
+    (opening,closing) = self.tags[name]
+    self.writelines(opening)
+    self.closing.append(closing)
+    self.indent += self.step
+  
+  def close(self):
+    """write the closing of the last tag opened"""
+    
+    self.indent = self.indent[:-len(self.step)]
+    self.writelines(self.closing.pop())
+  
+  def tag(self,name,lines):
+    """write lines inside the tag name, like writelines(tag(name,tab(lines)))"""
+    
+    self.open(name)
+    self.writelines(lines)
+    self.close()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+#
+# Writes a Schedule as an iCalendar (RFC 5545) file with one VEVENT per
+# Meeting that repeats weekly until the Meeting's End Date, streaming
+# each folded line to the file as it is made, and reads weekly VEVENTs
+# back into a Schedule one unfolded line and one VEVENT at a time
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import hashlib,re,calendar
+from HTMLParser import HTMLParser
+
+import schedule,event,meeting
+
+PRODID = '-//Joshua A Haas//schedconv//EN'
+LINE_OCTETS = 75
+EPOCH = dt.datetime(1970,1,1)
+
+# Imported events that repeat forever end on this date like the sample
+# config, and the RRULE parts that weekly Meetings can represent
+FOREVER = dt.date(3000,1,1)
+RRULE_PARTS = ['FREQ','INTERVAL','UNTIL','COUNT','BYDAY','WKST']
+DAYS = {'SU':'U','MO':'M','TU':'T','WE':'W','TH':'R','FR':'F','SA':'S'}
+ESCAPED = {'n':'\n','N':'\n'}
+DURATION = re.compile(r'^([+-]?)P(?:(\d+)W)?(?:(\d+)D)?'
+    +r'(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+def write(sched,fname,stamp=None):
+  """write sched as an iCalendar file to fname"""
+  
+  f = open(fname,'wb')
+  try:
+    for line in iterlines(sched,stamp):
+      f.write(line)
+  finally:
+    f.close()
+
+def iterlines(sched,stamp=None):
+  """generate the folded CRLF terminated lines of sched as iCalendar,
+  using the UTC dt.datetime stamp as the time it was made, which defaults
+  to the epoch so that the same sched always gives the same bytes"""
+  
+  if stamp is None:
+    stamp = EPOCH
+  stamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+  
+  for line in ['BEGIN:VCALENDAR','VERSION:2.0','PRODID:'+PRODID,
+      'CALSCALE:GREGORIAN']:
+    yield fold(line)
+  for eve in sched.events:
+    for meet in eve.meets:
+      for line in getvevent(eve,meet,stamp):
+        yield fold(line)
+  yield fold('END:VCALENDAR')
+
+def getvevent(eve,meet,stamp):
+  """return the unfolded lines of a VEVENT for meet of eve, or an empty
+  list if it never occurs"""
+  
+  first = meet.getfirstmeet()
+  last = meet.getlastmeet()
+  if last<first:
+    return []
+  
+  start = dt.datetime.combine(first,meet.getinfo('Start Time'))
+  end = dt.datetime.combine(first,meet.getinfo('End Time'))
+  if end<=start:
+    end += dt.timedelta(days=1)
+  
+  lines = ['BEGIN:VEVENT']
+  lines.append('UID:'+getuid(eve,meet))
+  lines.append('DTSTAMP:'+stamp)
+  lines.append('DTSTART:'+start.strftime('%Y%m%dT%H%M%S'))
+  lines.append('DTEND:'+end.strftime('%Y%m%dT%H%M%S'))
+  if last>first:
+    lines.append('RRULE:FREQ=WEEKLY;UNTIL='+last.strftime('%Y%m%d')+'T235959')
+  lines.append('SUMMARY:'+escape(eve.getinfo('Title')))
+  if meet.getinfo('Location'):
+    lines.append('LOCATION:'+escape(meet.getinfo('Location')))
+  description = getdescription(eve,meet)
+  if description:
+    lines.append('DESCRIPTION:'+escape(description))
+  if eve.getinfo('Type'):
+    lines.append('CATEGORIES:'+escape(eve.getinfo('Type')))
+  lines.append('END:VEVENT')
+  return lines
+
+def getdescription(eve,meet):
+  """return the Class fields not in other properties, one per line"""
+  
+  fields = []
+  for (key,info) in [('Course',eve.info),('CRN',eve.info),
+      ('Instructor',meet.info),('Credits',eve.info)]:
+    if info.get(key) is not None:
+      fields.append(key+': '+tostr(info[key]))
+  return '\n'.join(fields)
+
+def getuid(eve,meet):
+  """return a UID that stays the same for the same meet of eve"""
+  
+  key = repr((eve.getinfo('Title'),eve.info.get('CRN'),meet.getkey()))
+  return hashlib.sha1(key).hexdigest()+'@schedconv'
+
+def tostr(value):
+  """return value as a string, keeping unicode as it is"""
+  
+  if isinstance(value,basestring):
+    return value
+  return str(value)
+
+def escape(s):
+  """return the string s escaped as an iCalendar TEXT value, replacing
+  html entities such as &amp; kept from the Rowan page"""
+  
+  s = tostr(s)
+  if '&' in s:
+    s = HTMLParser().unescape(s)
+  s = s.replace('\\','\\\\').replace(';','\\;').replace(',','\\,')
+  return s.replace('\r\n','\\n').replace('\n','\\n')
+
+def fold(line):
+  """return line encoded as UTF-8 and folded into CRLF terminated lines
+  of at most LINE_OCTETS octets without splitting any characters"""
+  
+  if isinstance(line,unicode):
+    line = line.encode('utf-8')
+  parts = []
+  limit = LINE_OCTETS
+  while len(line)>limit:
+    i = limit
+    
+    # Back up to the start of a UTF-8 character
+    while (i>0) and (0x80<=ord(line[i])<0xC0):
+      i -= 1
+    parts.append(line[:i])
+    line = line[i:]
+    limit = LINE_OCTETS-1
+  parts.append(line)
+  return '\r\n '.join(parts)+'\r\n'
+
+def read(fname):
+  """return (Schedule,skipped) of the VEVENTs in the iCalendar file
+  fname, where skipped is a list of (summary,reason) for each VEVENT that
+  cannot be represented as weekly Meetings"""
+  
+  sched = schedule.Schedule()
+  skipped = []
+  f = open(fname,'rb')
+  try:
+    for props in iterevents(f):
+      try:
+        sched.addevent(toevent(props))
+      except ValueError, e:
+        skipped.append((getvalue(props,'SUMMARY',''),str(e)))
+  finally:
+    f.close()
+  return (sched,skipped)
+
+def unfold(f):
+  """generate the unfolded lines of the file f"""
+  
+  line = None
+  for raw in f:
+    raw = raw.rstrip('\r\n')
+    if (line is not None) and (raw[:1] in (' ','\t')):
+      line += raw[1:]
+    else:
+      if line:
+        yield line
+      line = raw
+  if line:
+    yield line
+
+def parseline(line):
+  """return (name,{param:value},value) of the content line, or None if it
+  has no value"""
+  
+  quoted = False
+  for (i,c) in enumerate(line):
+    if c=='"':
+      quoted = not quoted
+    elif (c==':') and (not quoted):
+      break
+  else:
+    return None
+  parts = line[:i].split(';')
+  params = {}
+  for part in parts[1:]:
+    if '=' in part:
+      (key,value) = part.split('=',1)
+      params[key.upper()] = value.strip('"')
+  return (parts[0].upper(),params,line[i+1:])
+
+def iterevents(f):
+  """generate a dict of {name:[(params,value),...]} for the properties of
+  each VEVENT in the file f, ignoring components inside it like VALARM"""
+  
+  props = None
+  depth = 0
+  for line in unfold(f):
+    parsed = parseline(line)
+    if parsed is None:
+      continue
+    (name,params,value) = parsed
+    if name=='BEGIN':
+      if props is not None:
+        depth += 1
+      elif value.upper()=='VEVENT':
+        props = {}
+    elif name=='END':
+      if depth>0:
+        depth -= 1
+      elif (props is not None) and (value.upper()=='VEVENT'):
+        yield props
+        props = None
+    elif (props is not None) and (depth==0):
+      props.setdefault(name,[]).append((params,value))
+
+def getvalue(props,name,default=None):
+  """return the unescaped text of the first property name in props"""
+  
+  if name not in props:
+    return default
+  return unescape(props[name][0][1])
+
+def unescape(s):
+  """return the iCalendar TEXT value s without escapes"""
+  
+  return re.sub(r'\\([\\;,nN])',lambda m: ESCAPED.get(m.group(1),m.group(1)),s)
+
+def toevent(props):
+  """return an event.Event with a Meeting for each day the VEVENT props
+  repeats on, or raise ValueError if it cannot be represented"""
+  
+  for name in ['RECURRENCE-ID','RDATE','EXDATE','EXRULE']:
+    if name in props:
+      raise ValueError('Cannot represent '+name)
+  
+  start = getdatetime(props,'DTSTART')
+  if 'DTEND' in props:
+    end = getdatetime(props,'DTEND')
+  elif 'DURATION' in props:
+    end = start+parseduration(props['DURATION'][0][1])
+  else:
+    raise ValueError('No end time')
+  midnight = (end.time()==dt.time(0)) and (end.date()==start.date()+dt.timedelta(days=1))
+  if not (((end.date()==start.date()) and (end>start)) or midnight):
+    raise ValueError('Does not start and end on the same day')
+  
+  rule = getrule(props)
+  first = start.date()
+  if rule is None:
+    days = [meeting.DAYS[first.isoweekday()%7]]
+    last = first
+  else:
+    days = rule['days'] or [meeting.DAYS[first.isoweekday()%7]]
+    last = getlastdate(rule,start,days)
+  
+  rows = []
+  for day in days:
+    
+    # Skip days with no occurrences, then make sure End Date is after
+    # Start Date for events that only occur once
+    offset = (meeting.DAYS.index(day)-first.isoweekday()%7)%7
+    if first+dt.timedelta(days=offset)>last:
+      continue
+    rows.append({'Start Date' : first,
+                 'End Date'   : max(last,first+dt.timedelta(days=1)),
+                 'Day'        : day,
+                 'Start Time' : start.time(),
+                 'End Time'   : end.time(),
+                 'Location'   : getvalue(props,'LOCATION','')})
+  if len(rows)==0:
+    raise ValueError('Never occurs')
+  
+  eve = event.Event({'Title':getvalue(props,'SUMMARY',''),'Type':'iCalendar'})
+  eve.addmeets(meeting.Meeting.frombatch(rows,eve))
+  return eve
+
+def getdatetime(props,name):
+  """return the dt.datetime of the property name in props in local time,
+  or raise ValueError if it is missing or only a date"""
+  
+  if name not in props:
+    raise ValueError('No '+name)
+  (params,value) = props[name][0]
+  if (params.get('VALUE','').upper()=='DATE') or (len(value)==8):
+    raise ValueError('Cannot represent all-day events')
+  return parsedatetime(value)
+
+def parsedatetime(value):
+  """return the local dt.datetime of the iCalendar DATE-TIME value,
+  converting UTC times ending in Z to local time"""
+  
+  t = dt.datetime.strptime(value[:15],'%Y%m%dT%H%M%S')
+  if value.endswith('Z'):
+    t = dt.datetime.fromtimestamp(calendar.timegm(t.timetuple()))
+  return t
+
+def parseduration(value):
+  """return the dt.timedelta of the iCalendar DURATION value"""
+  
+  match = DURATION.match(value.strip())
+  if match is None:
+    raise ValueError('Bad DURATION "'+value+'"')
+  (sign,weeks,days,hours,minutes,seconds) = match.groups()
+  delta = dt.timedelta(weeks=int(weeks or 0),days=int(days or 0),
+      hours=int(hours or 0),minutes=int(minutes or 0),seconds=int(seconds or 0))
+  if sign=='-':
+    raise ValueError('Negative DURATION')
+  return delta
+
+def getrule(props):
+  """return None if props does not repeat or a dict of its weekly RRULE
+  with the list of meeting.DAYS it repeats on as 'days', or raise
+  ValueError if it cannot be represented"""
+  
+  if 'RRULE' not in props:
+    return None
+  if len(props['RRULE'])>1:
+    raise ValueError('Cannot represent more than one RRULE')
+  rule = {}
+  for part in props['RRULE'][0][1].split(';'):
+    if '=' in part:
+      (key,value) = part.split('=',1)
+      rule[key.upper()] = value.upper()
+  for key in rule.keys():
+    if key not in RRULE_PARTS:
+      raise ValueError('Cannot represent RRULE part '+key)
+  if rule.get('FREQ')!='WEEKLY':
+    raise ValueError('Cannot represent FREQ='+str(rule.get('FREQ')))
+  if rule.get('INTERVAL','1')!='1':
+    raise ValueError('Cannot represent INTERVAL='+rule['INTERVAL'])
+  
+  rule['days'] = []
+  if 'BYDAY' in rule:
+    for day in rule['BYDAY'].split(','):
+      if day not in DAYS:
+        raise ValueError('Cannot represent BYDAY='+day)
+      if DAYS[day] not in rule['days']:
+        rule['days'].append(DAYS[day])
+  return rule
+
+def getlastdate(rule,start,days):
+  """return the dt.date of the last occurrence of the weekly rule
+  starting at the dt.datetime start on days without listing them"""
+  
+  if 'UNTIL' in rule:
+    until = rule['UNTIL']
+    if len(until)==8:
+      return dt.datetime.strptime(until,'%Y%m%d').date()
+    until = parsedatetime(until)
+    if until.time()<start.time():
+      return until.date()-dt.timedelta(days=1)
+    return until.date()
+  
+  if 'COUNT' in rule:
+    count = int(rule['COUNT'])
+    if count<1:
+      raise ValueError('Never occurs')
+    first = start.date()
+    offsets = sorted([(meeting.DAYS.index(d)-first.isoweekday()%7)%7 for d in days])
+    (weeks,i) = divmod(count-1,len(offsets))
+    return first+dt.timedelta(days=7*weeks+offsets[i])
+  
+  return FOREVER
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#
+# Instrumentation that times stages of a run, counts calls to hot
+# functions, measures peak memory and optionally profiles the run, then
+# appends the results as one JSON record per line to a file
+#
+# Memory is traced with tracemalloc where it exists (Python 3.4+). Python
+# 2 only has the maximum resident set size, which is the peak over the
+# whole process, so records also give how much it grew during the run;
+# in a long-lived process such as a pool worker that growth is 0 unless
+# the run needed more memory than every earlier run
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import time,json,cProfile
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+class Instrument:
+  """Collects stage timings and call counts by temporarily replacing
+  functions on modules or classes between start() and stop()"""
+  
+  def __init__(self,fname=None,profile=False,proffile=None,memory=True):
+    """create a new Instrument writing records to fname and cProfile
+    stats to proffile if profile is True"""
+    
+    self.fname = fname
+    self.profile = profile
+    self.proffile = proffile
+    self.memory = memory
+    self.patched = []
+    self.stages = []
+    self.calls = {}
+    self.depth = 0
+    self.started = None
+    self.profiler = None
+    self.maxrss = None
+  
+  def stage(self,obj,name,label=None):
+    """time every call to the function name of the module or class obj"""
+    
+    label = label or name
+    func = obj.__dict__[name]
+    
+    def wrapper(*args,**kwargs):
+      start = time.time()
+      self.depth += 1
+      try:
+        return func(*args,**kwargs)
+      finally:
+        self.depth -= 1
+        self.stages.append({'stage':label,'depth':self.depth,
+            'start':start-(self.started or start),'seconds':time.time()-start})
+    
+    self.patch(obj,name,wrapper)
+  
+  def count(self,obj,name,label=None):
+    """count calls to the function name of the module or class obj"""
+    
+    label = label or name
+    func = obj.__dict__[name]
+    self.calls[label] = 0
+    
+    def wrapper(*args,**kwargs):
+      self.calls[label] += 1
+      return func(*args,**kwargs)
+    
+    self.patch(obj,name,wrapper)
+  
+  def patch(self,obj,name,wrapper):
+    """replace name on obj with wrapper until stop() is called"""
+    
+    self.patched.append((obj,name,obj.__dict__[name]))
+    setattr(obj,name,wrapper)
+  
+  def unpatch(self):
+    """put back every function replaced by patch()"""
+    
+    while len(self.patched)>0:
+      (obj,name,func) = self.patched.pop()
+      setattr(obj,name,func)
+  
+  def start(self):
+    """start timing, measuring memory and profiling"""
+    
+    if self.memory:
+      if tracemalloc is not None:
+        tracemalloc.start()
+      self.maxrss = getmaxrss()
+    if self.profile:
+      self.profiler = cProfile.Profile()
+      self.profiler.enable()
+    self.started = time.time()
+  
+  def stop(self,**info):
+    """stop everything started by start(), put back replaced functions and
+    return the record, which is also appended to fname if given. Any
+    keyword arguments are added to the record"""
+    
+    total = time.time()-self.started
+    if self.profiler is not None:
+      self.profiler.disable()
+      if self.proffile is not None:
+        self.profiler.dump_stats(self.proffile)
+    self.unpatch()
+    
+    record = ({'time'   : dt.datetime.now().isoformat(),
+               'total'  : total,
+               'stages' : sorted(self.stages,key=(lambda s: s['start'])),
+               'calls'  : self.calls})
+    if self.memory:
+      record['memory'] = getmemory(self.maxrss)
+    if self.profiler is not None:
+      record['profile'] = self.proffile
+    record.update(info)
+    
+    if self.fname is not None:
+      f = open(self.fname,'a')
+      try:
+        f.write(json.dumps(record,sort_keys=True)+'\n')
+      finally:
+        f.close()
+    return record
+
+def getmemory(before=None):
+  """return a dict with the peak memory use of the run, using tracemalloc
+  (and stopping it) if available, or else the maximum resident set size
+  of the process so far and its growth since it was before, or None if
+  neither is available"""
+  
+  if (tracemalloc is not None) and tracemalloc.is_tracing():
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'source':'tracemalloc','peak':peak,'unit':'B'}
+  peak = getmaxrss()
+  if peak is None:
+    return None
+  memory = {'source':'maxrss','peak':peak,'unit':'KB'}
+  if before is not None:
+    memory['growth'] = peak-before
+  return memory
+
+def getmaxrss():
+  """return the maximum resident set size of this process so far in KB,
+  or None if it is not available"""
+  
+  if resource is None:
+    return None
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# An interval tree (a treap augmented with the largest end point in each
+# subtree) for finding the items whose closed intervals overlap a query,
+# and for counting them in O(log n) from sorted lists of the end points
+# that are made again after the tree changes
+#
+# Author: Joshua A Haas
+
+import random,bisect
+
+class IntervalTree:
+  
+  def __init__(self):
+    """create a new empty IntervalTree"""
+    
+    self.root = None
+    self.keys = {}
+    self.seq = 0
+    self.ends = None
+  
+  def __len__(self):
+    """return the number of items in this IntervalTree"""
+    
+    return len(self.keys)
+  
+  def __contains__(self,item):
+    """return whether item is in this IntervalTree"""
+    
+    return id(item) in self.keys
+  
+  def insert(self,lo,hi,item):
+    """add item with the closed interval [lo,hi] to the tree"""
+    
+    if item in self:
+      self.remove(item)
+    key = (lo,hi,self.seq)
+    self.seq += 1
+    self.keys[id(item)] = key
+    self.ends = None
+    self.root = insert(self.root,Node(key,item))
+  
+  def remove(self,item):
+    """remove item from the tree if it is present"""
+    
+    key = self.keys.pop(id(item),None)
+    if key is not None:
+      self.ends = None
+      self.root = remove(self.root,key)
+  
+  def overlap(self,lo,hi):
+    """return the items whose intervals overlap [lo,hi] in the order
+    they were inserted"""
+    
+    nodes = []
+    query(self.root,lo,hi,nodes)
+    nodes.sort(key=(lambda node: node.key[2]))
+    return [node.item for node in nodes]
+  
+  def count(self,lo,hi):
+    """return the number of items whose intervals overlap [lo,hi] for
+    lo<=hi"""
+    
+    # Every interval starting at or before hi overlaps unless it also
+    # ends before lo, and those all start before lo as well
+    if self.ends is None:
+      keys = self.keys.values()
+      self.ends = (sorted([key[0] for key in keys]),sorted([key[1] for key in keys]))
+    (los,his) = self.ends
+    return max(0,bisect.bisect_right(los,hi)-bisect.bisect_left(his,lo))
+
+class Node(object):
+  
+  __slots__ = ('key','item','prio','left','right','maxhi')
+  
+  def __init__(self,key,item):
+    """create a new leaf Node with a random priority"""
+    
+    self.key = key
+    self.item = item
+    self.prio = random.random()
+    self.left = None
+    self.right = None
+    self.maxhi = key[1]
+  
+  def update(self):
+    """recompute maxhi from this Node and its children"""
+    
+    self.maxhi = self.key[1]
+    if (self.left is not None) and (self.left.maxhi>self.maxhi):
+      self.maxhi = self.left.maxhi
+    if (self.right is not None) and (self.right.maxhi>self.maxhi):
+      self.maxhi = self.right.maxhi
+
+def rotateright(node):
+  """rotate node's left child up and return it"""
+  
+  left = node.left
+  node.left = left.right
+  left.right = node
+  node.update()
+  left.update()
+  return left
+
+def rotateleft(node):
+  """rotate node's right child up and return it"""
+  
+  right = node.right
+  node.right = right.left
+  right.left = node
+  node.update()
+  right.update()
+  return right
+
+def insert(node,new):
+  """insert new below node and return the new subtree root"""
+  
+  if node is None:
+    return new
+  if new.key<node.key:
+    node.left = insert(node.left,new)
+    if node.left.prio>node.prio:
+      return rotateright(node)
+  else:
+    node.right = insert(node.right,new)
+    if node.right.prio>node.prio:
+      return rotateleft(node)
+  node.update()
+  return node
+
+def remove(node,key):
+  """remove the Node with key below node and return the new subtree root"""
+  
+  if node is None:
+    return None
+  if key<node.key:
+    node.left = remove(node.left,key)
+  elif key>node.key:
+    node.right = remove(node.right,key)
+  else:
+    if node.left is None:
+      return node.right
+    if node.right is None:
+      return node.left
+    if node.left.prio>node.right.prio:
+      node = rotateright(node)
+      node.right = remove(node.right,key)
+    else:
+      node = rotateleft(node)
+      node.left = remove(node.left,key)
+  node.update()
+  return node
+
+def query(node,lo,hi,nodes):
+  """append the Nodes below node whose intervals overlap [lo,hi]"""
+  
+  if (node is None) or (node.maxhi<lo):
+    return
+  query(node.left,lo,hi,nodes)
+  if node.key[0]>hi:
+    return
+  if node.key[1]>=lo:
+    nodes.append(node)
+  query(node.right,lo,hi,nodes)
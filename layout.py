@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# A layout engine that places the meetings of one week of a Schedule on
+# a grid of any resolution, giving overlapping meetings side by side
+# sub-columns by greedy interval graph coloring
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import heapq
+from collections import namedtuple
+
+import meeting
+
+# A meeting placed in day (an index into meeting.DAYS) covering rows from
+# row to row+rows-1 and sub-columns col to col+cols-1 of that day
+Placement = namedtuple('Placement','meet day row rows col cols')
+
+class Layout:
+  
+  def __init__(self,start,end,resolution,week):
+    """create a new empty Layout from the hour start to the hour end in
+    rows of resolution minutes for the week starting on the dt.date week"""
+    
+    self.start = start
+    self.end = end
+    self.resolution = resolution
+    self.week = week
+    self.rows = (end-start)*60//resolution
+    self.placements = []
+    self.columns = [1]*7
+  
+  def gettime(self,row):
+    """return the dt.time at the start of row"""
+    
+    return meeting.unpacktime((self.start*60+row*self.resolution)%meeting.MINUTES)
+  
+  def getgrid(self):
+    """return grid[row][day][col] holding (Placement,offset) for cells
+    covered by a Placement offset rows below its top or None if empty"""
+    
+    grid = [[[None]*self.columns[d] for d in range(0,7)]
+        for r in range(0,self.rows)]
+    for p in self.placements:
+      for r in range(p.row,p.row+p.rows):
+        for c in range(p.col,p.col+p.cols):
+          grid[r][p.day][c] = (p,r-p.row)
+    return grid
+
+def place(sched,week=None,start=8,end=24,resolution=5):
+  """return a Layout of the meetings of sched during the week containing
+  the dt.date week (default this week) from the hour start to the hour end
+  with rows of resolution minutes"""
+  
+  if week is None:
+    week = dt.date.today()
+  weekstart = week-dt.timedelta(days=week.isoweekday()%7)
+  calendar = sched.getcalendar()
+  days = [calendar.ondate(weekstart+dt.timedelta(days=d)) for d in range(0,7)]
+  return placedays(days,weekstart,start,end,resolution)
+
+def placedays(days,week,start=8,end=24,resolution=5):
+  """return a Layout of the lists of meetings for each day in days of the
+  week starting on the dt.date week"""
+  
+  lay = Layout(start,end,resolution,week)
+  for d in range(0,7):
+    placeday(lay,d,days[d])
+  return lay
+
+def getrows(lay,meet):
+  """return the (first,last+1) rows of lay covered by meet clipped to the
+  grid, treating meetings that end at or before they start as running
+  until midnight"""
+  
+  offset = lay.start*60
+  end = meet.endmin
+  if end<=meet.startmin:
+    end = meeting.MINUTES
+  first = (meet.startmin-offset)//lay.resolution
+  last = (end-offset+lay.resolution-1)//lay.resolution
+  return (max(first,0),min(last,lay.rows))
+
+def placeday(lay,day,meets):
+  """add Placements for meets on day to lay, giving each meeting the
+  lowest sub-column free at its start, in O(n log n)"""
+  
+  items = []
+  for meet in meets:
+    (first,last) = getrows(lay,meet)
+    if last>first:
+      items.append((first,last,meet.startmin,len(items),meet))
+  items.sort()
+  
+  # Each cluster of transitively overlapping meetings is as wide as the
+  # most sub-columns it uses; the last sub-column stretches to the edge
+  placed = []
+  clusters = []
+  active = []
+  free = []
+  for (first,last,_,_,meet) in items:
+    while (len(active)>0) and (active[0][0]<=first):
+      heapq.heappush(free,heapq.heappop(active)[1])
+    if len(active)==0:
+      free = []
+      clusters.append(0)
+    if len(free)>0:
+      col = heapq.heappop(free)
+    else:
+      col = clusters[-1]
+      clusters[-1] += 1
+    heapq.heappush(active,(last,col))
+    placed.append((meet,first,last-first,col,len(clusters)-1))
+  
+  columns = max(clusters+[1])
+  lay.columns[day] = columns
+  for (meet,row,rows,col,cluster) in placed:
+    cols = 1
+    if col==clusters[cluster]-1:
+      cols = columns-col
+    lay.placements.append(Placement(meet,day,row,rows,col,cols))
@@ -5,163 +5,295 @@
 # Author: Joshua A Haas
 
 import datetime as dt
-import util
+import heapq
 
 import event
 
 DAYS = ['U','M','T','W','R','F','S']
+MINUTES = 24*60
 
-class Meeting:
+def packtime(t):
+  """return the dt.time t as minutes since midnight"""
+  
+  return 60*t.hour+t.minute
+
+def unpacktime(m):
+  """return the minutes since midnight m as a dt.time"""
+  
+  return dt.time(m//60,m%60)
+
+def packstr(s):
+  """return s interned so equal strings share memory"""
+  
+  if isinstance(s,str):
+    return intern(s)
+  return s
+
+def unpackstr(s):
+  """return the packed string s"""
+  
+  return s
+
+def checkfields(info,fields):
+  """raise KeyError if the dict info has keys that are not in fields"""
+  
+  for key in info:
+    if key not in fields:
+      raise KeyError('Unknown field "'+str(key)+'"')
 
+def mergeoccurrences(meets,start=None,end=None):
+  """generate (start,end,meet) for the occurrences of all meets from the
+  dt.date start to the dt.date end in order of start time"""
+  
+  heap = []
+  for (i,meet) in enumerate(meets):
+    gen = meet.occurrences(start,end)
+    for (begin,finish) in gen:
+      heap.append((begin,finish,i,meet,gen))
+      break
+  heapq.heapify(heap)
+  
+  while len(heap)>0:
+    (begin,finish,i,meet,gen) = heap[0]
+    yield (begin,finish,meet)
+    occurrence = next(gen,None)
+    if occurrence is None:
+      heapq.heappop(heap)
+    else:
+      heapq.heapreplace(heap,occurrence+(i,meet,gen))
+
+class Meeting(object):
+  """Meetings keep their info packed into slots: the day as an index
+  into DAYS, times as minutes since midnight, dates as ordinals"""
+  
+  FIELDS = ({ 'Start Date' : dt.date,
+              'End Date'   : dt.date,
+              'Day'        : str,
+              'Start Time' : dt.time,
+              'End Time'   : dt.time,
+              'Location'   : str })
+  
+  # Maps each field to (slot,pack,unpack) for converting to and from slots
+  PACKING = ({ 'Start Date' : ('startord',dt.date.toordinal,dt.date.fromordinal),
+               'End Date'   : ('endord',dt.date.toordinal,dt.date.fromordinal),
+               'Day'        : ('day',DAYS.index,DAYS.__getitem__),
+               'Start Time' : ('startmin',packtime,unpacktime),
+               'End Time'   : ('endmin',packtime,unpacktime),
+               'Location'   : ('location',packstr,unpackstr) })
+  
+  KEYS = tuple(sorted(FIELDS.keys()))
+  
+  __slots__ = ('event','day','startmin','endmin','startord','endord','location')
+  
   def __init__(self,info,eve):
     """Create a new Meeting with the given info"""
     
-    self.FIELDS = ({ 'Start Date' : dt.date,
-                     'End Date'   : dt.date,
-                     'Day'        : str,
-                     'Start Time' : dt.time,
-                     'End Time'   : dt.time,
-                     'Location'   : str })
-    
     self.event = eve
     self.initinfo(info)
-    self.checkparams()
-    
+  
   def __eq__(self,obj):
     """override the == operator"""
     
-    return isinstance(obj,Meeting) and self.info == obj.info
-    
+    return isinstance(obj,Meeting) and self.getkey()==obj.getkey()
+  
   def __ne__(self,obj):
     """override the != operator"""
     
     return not self==obj
-
-  def initinfo(self,info):
-    """initialize info dict"""
+  
+  @classmethod
+  def frombatch(cls,rows,eve,check=True):
+    """return a list of new Meetings of eve, one for each info dict in
+    rows, validating all of them in one pass over each field unless check
+    is False (e.g. for rows from a trusted source)"""
     
-    self.info = util.blankdict(self.FIELDS.keys())
-    util.checkdict(info,self.FIELDS.keys())
-    self.importinfo(info)
-
-  def checkparams(self):
-    """make sure all parameters are valid"""
+    cols = dict([(key,[]) for key in cls.FIELDS])
+    for row in rows:
+      if check:
+        checkfields(row,cls.FIELDS)
+      for (key,col) in cols.items():
+        col.append(row.get(key))
+    if check:
+      cls.checkcolumns(cols,eve)
+    
+    meets = [cls.__new__(cls) for i in xrange(len(cols['Day']))]
+    for meet in meets:
+      meet.event = eve
+    for (key,(slot,pack,_)) in cls.PACKING.items():
+      for (meet,value) in zip(meets,cols[key]):
+        setattr(meet,slot,pack(value))
+    return meets
+  
+  @classmethod
+  def checkcolumns(cls,cols,eve):
+    """raise TypeError or ValueError unless every row of the dict cols of
+    {field:[values]} is valid for a Meeting of eve"""
     
     # Check classes
-    for key in self.FIELDS.keys():
-      assert isinstance(self.info[key],self.FIELDS[key]), 'Parameter "'+key+'" must be of type '+self.FIELDS[key]
-    assert issubclass(self.event.__class__,event.Event), 'Parameter event must be subclass of Event'
+    for (key,kind) in cls.FIELDS.items():
+      for value in cols[key]:
+        if not isinstance(value,kind):
+          raise TypeError('Parameter "'+key+'" must be of type '+kind.__name__)
+    if not isinstance(eve,event.Event):
+      raise TypeError('Parameter event must be subclass of Event')
     
     # Check values
-    assert self.info['Start Date']<self.info['End Date'], 'Parameter "End Date" must be after "Start Date"'
-    assert self.info['Day'] in DAYS, 'Parameter "Day" must be any of: M, T, W, R, F, S, U'
-    assert self.info['Start Time']<self.info['End Time'] or self.info['End Time'].hour==0, 'Parameter "End Time" must be after "Start Time"'
-
+    for (start,end) in zip(cols['Start Date'],cols['End Date']):
+      if not start<end:
+        raise ValueError('Parameter "End Date" must be after "Start Date"')
+    for day in cols['Day']:
+      if day not in DAYS:
+        raise ValueError('Parameter "Day" must be any of: M, T, W, R, F, S, U')
+    for (start,end) in zip(cols['Start Time'],cols['End Time']):
+      if not (start<end or end.hour==0):
+        raise ValueError('Parameter "End Time" must be after "Start Time"')
+  
+  def initinfo(self,info):
+    """initialize info slots"""
+    
+    checkfields(info,self.FIELDS)
+    full = dict.fromkeys(self.FIELDS)
+    full.update(info)
+    self.checkparams(full)
+    self.pack(full)
+  
+  def checkparams(self,info=None):
+    """make sure all parameters are valid, raising TypeError or ValueError
+    if not"""
+    
+    if info is None:
+      info = self.info
+    self.checkcolumns(dict([(key,[info[key]]) for key in self.FIELDS]),self.event)
+  
+  def pack(self,info):
+    """store the dict info in this Meeting's slots"""
+    
+    for (key,(slot,pack,_)) in self.PACKING.items():
+      setattr(self,slot,pack(info[key]))
+  
+  def getkey(self):
+    """return a tuple that is equal for Meetings with equal info"""
+    
+    return (self.KEYS,)+tuple([getattr(self,self.PACKING[key][0])
+        for key in self.KEYS])
+  
+  @property
+  def info(self):
+    """the info dict unpacked from this Meeting's slots"""
+    
+    return dict([(key,self.getinfo(key)) for key in self.FIELDS.keys()])
+  
   def getinfo(self,field=None):
     """return the requested info, or the entire dict if not specified"""
     
     if field is None:
       return self.info
-    return self.info[field]
+    (slot,_,unpack) = self.PACKING[field]
+    return unpack(getattr(self,slot))
   
   def importinfo(self,info):
     """import info from the dict info into this Meeting"""
     
-    self.info = util.updatedict(self.info,info)
-
+    checkfields(info,self.FIELDS)
+    full = self.info
+    full.update(info)
+    self.pack(full)
+  
   def conflicts(self,other):
     """check if this Meeting overlaps the Meeting other"""
     
-    assert isinstance(other,Meeting), 'The argument to Meeting.conflicts() must be of type Meeting'
+    if not isinstance(other,Meeting):
+      raise TypeError('The argument to Meeting.conflicts() must be of type Meeting')
     
-    # If equal, they conflict
-    if self==other:
-      return True
-    
-    # If dates do not overlap, no conflict
-    if (self.info['End Date']<other.info['Start Date'] or
-        self.info['Start Date']>other.info['End Date']):
+    # If not on the same day, no conflict (and they cannot be equal)
+    if self.day!=other.day:
       return False
     
-    # If not on the same day, no conflict
-    if self.info['Day']!=other.info['Day']:
-      return False
+    # If dates do not overlap, no conflict unless equal
+    if (self.endord<other.startord or
+        self.startord>other.endord):
+      return self==other
     
-    # If times do not overlap, no conflict
-    if (self.info['End Time']<=other.info['Start Time'] or
-        self.info['Start Time']>=other.info['End Time']):
-      return False
+    # If times do not overlap, no conflict unless equal (which is only
+    # possible for meetings that end at or before they start)
+    if (self.endmin<=other.startmin or
+        self.startmin>=other.endmin):
+      return (self.startmin>=self.endmin) and (self==other)
     
     return True
   
   def getduration(self):
     """return the duration of this meeting"""
     
-    start = self.info['Start Time']
-    if start==0:
-      start = 24
-    end = self.info['End Time']
-    hrs = end.hour-start.hour
-    mins = end.minute-start.minute
-    return dt.timedelta(0,0,0,0,mins,hrs)
+    return dt.timedelta(minutes=(self.endmin-self.startmin)%MINUTES)
   
   def getnummeets(self):
     """return the number of times this meeting will occur"""
     
-    meets = 0
-    current = self.info['Start Date']
-    end = self.info['End Date']
-    daynum = ['M','T','W','R','F','S','U'].index(self.info['Day'])
-    while current<=end:
-      if current.weekday()==daynum:
-        meets += 1
-    return meets
-
+    return max(0,(self.getlastord()-self.getfirstord())//7+1)
+  
+  def occurrences(self,start=None,end=None):
+    """generate (start,end) dt.datetimes for each time this meeting
+    occurs on a date from the dt.date start to the dt.date end"""
+    
+    first = self.getfirstord()
+    last = self.getlastord()
+    if start is not None:
+      lo = start.toordinal()
+      first = max(first,lo+(self.day-lo%7)%7)
+    if end is not None:
+      hi = end.toordinal()
+      last = min(last,hi-(hi%7-self.day)%7)
+    
+    time = unpacktime(self.startmin)
+    duration = self.getduration()
+    for o in xrange(first,last+1,7):
+      begin = dt.datetime.combine(dt.date.fromordinal(o),time)
+      yield (begin,begin+duration)
+  
   def getfirstmeet(self):
     """return the first date this meeting will occur"""
     
-    startdate = self.info['Start Date']
-    startday = startdate.isoweekday()%7
-    weekday = DAYS.index(self.info['Day'])
-    startdate = startdate+dt.timedelta(weekday-startday)
-    if weekday<startday:
-      return startdate+dt.timedelta(days=7)
-    return startdate
-
+    return dt.date.fromordinal(self.getfirstord())
+  
   def getlastmeet(self):
     """return the last date this meting will occur"""
     
-    enddate = self.info['End Date']
-    endday = enddate.isoweekday()%7
-    weekday = DAYS.index(self.info['Day'])
-    enddate = enddate+dt.timedelta(weekday-endday)
-    if weekday>endday:
-      return enddate-dt.timedelta(days=7)
-    return enddate
+    return dt.date.fromordinal(self.getlastord())
+  
+  def getfirstord(self):
+    """return the ordinal of the first date this meeting will occur"""
+    
+    return self.startord+(self.day-self.startord%7)%7
+  
+  def getlastord(self):
+    """return the ordinal of the last date this meeting will occur"""
+    
+    return self.endord-(self.endord%7-self.day)%7
 
 class ClassMeeting(Meeting):
   """ClassMeetings also have an instructor"""
   
-  def __init__(self,info,eve):
-    """create a new ClassMeeting with the given info"""
-    
-    self.FIELDS = ({ 'Start Date' : dt.date,
-                     'End Date'   : dt.date,
-                     'Day'        : str,
-                     'Start Time' : dt.time,
-                     'End Time'   : dt.time,
-                     'Location'   : str,
-                     'Instructor' : str })
-    
-    self.event = eve
-    self.initinfo(info)
-    self.checkparams()
+  FIELDS = ({ 'Start Date' : dt.date,
+              'End Date'   : dt.date,
+              'Day'        : str,
+              'Start Time' : dt.time,
+              'End Time'   : dt.time,
+              'Location'   : str,
+              'Instructor' : str })
+  
+  PACKING = dict(Meeting.PACKING)
+  PACKING['Instructor'] = ('instructor',packstr,unpackstr)
+  
+  KEYS = tuple(sorted(FIELDS.keys()))
+  
+  __slots__ = ('instructor',)
   
   def __eq__(self,obj):
     """override == operator"""
     
-    return isinstance(obj,ClassMeeting) and self.info == obj.info
-    
+    return isinstance(obj,ClassMeeting) and self.getkey()==obj.getkey()
+  
   def __ne__(self,obj):
     """override != operator"""
     
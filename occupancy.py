@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Weekly occupancy bitsets of Schedules, where each bit is one slot of
+# one day, so many Schedules can be combined with bitwise operations
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+
+import meeting
+
+SLOT = 5
+
+def getslots(slot=SLOT):
+  """return the number of slots of slot minutes in a day"""
+  
+  return meeting.MINUTES//slot
+
+def getbits(sched,week=None,slot=SLOT):
+  """return an int with bit (day*getslots(slot)+i) set if the i-th slot
+  of day (an index into meeting.DAYS) is busy during the week containing
+  the dt.date week, or in any week if week is None"""
+  
+  if week is None:
+    meets = sched.getallmeets()
+  else:
+    weekstart = week-dt.timedelta(days=week.isoweekday()%7)
+    calendar = sched.getcalendar()
+    meets = []
+    for d in range(0,7):
+      meets += calendar.ondate(weekstart+dt.timedelta(days=d))
+  
+  bits = 0
+  for meet in meets:
+    bits |= getmeetbits(meet,slot)
+  return bits
+
+def getmeetbits(meet,slot=SLOT):
+  """return the bits of the slots occupied by meet"""
+  
+  # Meetings that end at or before they start run until midnight
+  end = meet.endmin
+  if end<=meet.startmin:
+    end = meeting.MINUTES
+  first = meet.startmin//slot
+  last = (end+slot-1)//slot
+  return ((1<<(last-first))-1) << (meet.day*getslots(slot)+first)
+
+def isset(bits,day,i,slot=SLOT):
+  """return whether the i-th slot of day is set in bits"""
+  
+  return ((bits >> (day*getslots(slot)+i)) & 1)==1
+
+def getunion(bitsets):
+  """return the bits set in any of bitsets"""
+  
+  union = 0
+  for bits in bitsets:
+    union |= bits
+  return union
+
+def getintersection(bitsets):
+  """return the bits set in all of bitsets"""
+  
+  bitsets = list(bitsets)
+  if len(bitsets)==0:
+    return 0
+  inter = bitsets[0]
+  for bits in bitsets[1:]:
+    inter &= bits
+  return inter
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+#
+# A streaming parser for the table rows of Rowan's concise student
+# schedule page that does not depend on how the html is split into lines
+#
+# Author: Joshua A Haas
+
+from HTMLParser import HTMLParser
+
+TABLE_TEXT = 'Display course details for a student'
+CHUNK_SIZE = 64*1024
+
+def iterrows(htmlfile,chunksize=CHUNK_SIZE):
+  """generate the list of cell strings of each course row in the course
+  details table of htmlfile while reading it in chunks"""
+  
+  parser = RowanParser()
+  f = open(htmlfile)
+  try:
+    while not parser.done:
+      chunk = f.read(chunksize)
+      if not chunk:
+        break
+      parser.feed(chunk)
+      while len(parser.rows)>0:
+        yield parser.rows.pop(0)
+  finally:
+    f.close()
+
+class RowanParser(HTMLParser):
+  """Collects the rows of the table containing TABLE_TEXT in self.rows,
+  ignoring the first (table headers) and last (total credits) rows"""
+  
+  def __init__(self):
+    """create a new RowanParser"""
+    
+    HTMLParser.__init__(self)
+    self.rows = []
+    self.done = False
+    self.found = False
+    self.text = ''
+    self.depth = 0
+    self.target = None
+    self.count = 0
+    self.last = None
+    self.row = None
+    self.cell = None
+  
+  def handle_starttag(self,tag,attrs):
+    """open tables, rows and cells"""
+    
+    if self.done:
+      return
+    if tag=='table':
+      self.depth += 1
+      if self.target is None:
+        if self.found or any([TABLE_TEXT in (v or '') for (k,v) in attrs]):
+          self.target = self.depth
+    elif self.intarget():
+      if tag=='tr':
+        self.endrow()
+        self.row = []
+      elif (tag in ('td','th')) and (self.row is not None):
+        self.endcell()
+        self.cell = []
+  
+  def handle_endtag(self,tag):
+    """close tables, rows and cells"""
+    
+    if self.done:
+      return
+    if tag=='table':
+      if self.intarget():
+        self.endrow()
+        self.done = True
+      self.depth -= 1
+    elif self.intarget():
+      if tag in ('td','th'):
+        self.endcell()
+      elif tag=='tr':
+        self.endrow()
+  
+  def handle_data(self,data):
+    """add data to the current cell or look for the table text"""
+    
+    if self.done:
+      return
+    if self.cell is not None:
+      self.cell.append(data)
+    elif self.target is None:
+      
+      # The text may be split across chunks, so keep the end of the last
+      text = self.text+data
+      self.text = text[-len(TABLE_TEXT):]
+      if TABLE_TEXT in text:
+        if self.depth>0:
+          self.target = self.depth
+        else:
+          self.found = True
+  
+  def handle_entityref(self,name):
+    """keep entities such as &nbsp; as they appear in the html"""
+    
+    self.handle_data('&'+name+';')
+  
+  def handle_charref(self,name):
+    """keep character references as they appear in the html"""
+    
+    self.handle_data('&#'+name+';')
+  
+  def intarget(self):
+    """return whether the parser is directly inside the target table"""
+    
+    return (self.target is not None) and (self.depth==self.target)
+  
+  def endcell(self):
+    """finish the current cell if there is one"""
+    
+    if self.cell is not None:
+      self.row.append(''.join(self.cell).strip())
+      self.cell = None
+  
+  def endrow(self):
+    """finish the current row if there is one, holding it back until the
+    next row so the first and last rows can be dropped"""
+    
+    self.endcell()
+    if self.row is None:
+      return
+    if (self.count>1) and (self.last is not None):
+      self.rows.append(self.last)
+    self.count += 1
+    if self.count>1:
+      self.last = self.row
+    self.row = None
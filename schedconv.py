@@ -4,66 +4,529 @@
 # Rowan's concise student schedule page.  The output can be either
 # text, ascii, or html.
 #
-# Can also parse events added manually in a config file.
+# Can also parse events added manually in a config file, and weekly
+# events from an iCalendar file exported by another calendar.
 #
 # Author: Joshua A Haas
 
 import datetime as dt
 import ConfigParser as cp
-import sys,os.path
+import sys,os.path,time,hashlib,filecmp,json,argparse,functools,itertools,copy
+import multiprocessing
 
 import quickfile as qf
 import util
 from htmlwriter import tab,tag,tags,css,br,space,comment
 
-import schedule,event,meeting
+import schedule,event,meeting,rowanparser,snapshot,occupancy,layout
+import instrument,htmlstream,abbrev,ical
 
 COLUMNS = (['CRN','Course','Title','Campus','Credits','Level',
             'Start Date','End Date','Day','Time','Location','Instructor'])
 EVENT_COLS = 6
 ROWAN_FILE = '~/rowan.html'
 CONFIG_FILE = '~/sched.conf'
+CALENDAR_FILE = '~/calendar.ics'
 ASCII_FILE = '~/sched-ascii.txt'
 HTML_FILE = '~/public_html/sched.html'
 LOG_FILE = '~/sched.log'
+STATE_FILE = '~/.sched.state'
+SNAPSHOT_FILE = '~/.sched.snap'
+OVERLAP_FILE = '~/public_html/overlap.html'
+WEEKS_FILE = '~/public_html/sched-weeks.html'
+WEEK_PAGE = 'sched-%Y-%m-%d.html'
+ICAL_FILE = '~/public_html/sched.ics'
+OPTION_SECTIONS = ['HTML Options','Abbreviations']
+STATS_FILE = '~/sched-stats.log'
+PROFILE_FILE = '~/sched.prof'
+WATCH_FILES = [CONFIG_FILE,ROWAN_FILE,CALENDAR_FILE]
+WATCH_INTERVAL = 1.0
+WATCH_DELAY = 2.0
 
-def convert():
-  """parse config and rowan to generate ascii and html"""
-  
-  configfile = os.path.expanduser(CONFIG_FILE)
-  rowanfile = os.path.expanduser(ROWAN_FILE)
-  asciifile = os.path.expanduser(ASCII_FILE)
-  htmlfile = os.path.expanduser(HTML_FILE)
+# Rules for abbreviating upper case titles and locations in order, which
+# the [Abbreviations] section of the config file can replace
+TITLE_RULES = ([('SOC SCI:',''),
+                ('LITERATURE:',''),
+                ('SEMINAR: ',''),
+                ('ST:',''),
+                ('ST ECE:',''),
+                ('INTRODUCTION','I'),
+                ('INTRO','I'),
+                ('I TO','I'),
+                ('HONORS','H'),
+                ('HONOR','H'),
+                ('HONR','H'),
+                ('ELECTRICAL','ELEC'),
+                ('ENGINEERING','ENG'),
+                ('COMPUTER SCIENCE','CS'),
+                ('COMPUTERS','COMP'),
+                ('COMPUTER','COMP'),
+                (' AND ',' & '),
+                ('- ',''),
+                ('HISTORY','HIST'),
+                ('MATHEMATICAL','MATH'),
+                ('TECHNOLOGIES','TECH'),
+                ('TECHNOLOGY','TECH'),
+                ('STATISTICS','STAT'),
+                ('DIGITAL','DIG'),
+                ('READINGS IN','READ'),
+                ('FRESHMAN','FRESH'),
+                ('SOPHOMOE','SOPH'),
+                ('JUNIOR','JUN'),
+                ('SENIO','SEN')])
+LOCATION_RULES = ([(' HALL',''),
+                   (' CENTER',''),
+                   (' BUILDING',''),
+                   (' BLDG',''),
+                   ('CL-',''),
+                   ('ROBINSON','ROBIN'),
+                   ('WHITNEY','WHIT'),
+                   ('ENTERPRISE','ENTERP'),
+                   ('HAWTHORNE','HAWTH')])
+ABBREVIATIONS = ({'title'    : abbrev.Abbreviator(TITLE_RULES),
+                  'location' : abbrev.Abbreviator(LOCATION_RULES)})
+
+# The stages of convert() to time and hot functions to count when
+# instrumented, see instrumentconvert()
+STAGES = (['parseconfig','parserowan','parseical','getlayout','getgridlayout',
+    'writeascii','writehtml'])
+COUNTED = ['findinmatrix','freespaceup']
+
+def convert(force=False,home=None,inst=None,cache=None):
+  """parse config and rowan to generate ascii and html unless nothing
+  has changed since the last run (or force is True) for the user with
+  the given home directory (default the current user), recording stage
+  timings with the instrument.Instrument inst if given or enabled by the
+  instrument option, and keeping the parsed Schedule in the dict cache
+  if given to reuse while the inputs are unchanged"""
+  
+  configfile = getpath(CONFIG_FILE,home)
+  rowanfile = getpath(ROWAN_FILE,home)
+  icsfile = getpath(CALENDAR_FILE,home)
+  asciifile = getpath(ASCII_FILE,home)
+  htmlfile = getpath(HTML_FILE,home)
+  statefile = getpath(STATE_FILE,home)
+  snapfile = getpath(SNAPSHOT_FILE,home)
+  logfile = getpath(LOG_FILE,home)
   
   if not os.path.isfile(configfile):
     writedefaultconfig(configfile)
     print 'Generated default config file "'+CONFIG_FILE+'"'
-  s = parseconfig(configfile)
   
-  if os.path.isfile(rowanfile):
-    s2 = parserowan(rowanfile)
-    s.addevents(s2.getevents())
+  opts = parsehtmlconfig(configfile)
+  setabbreviations(parseabbrevconfig(configfile))
+  dohtml = opts.has_key('write-html') and opts['write-html'].lower()=='true'
+  
+  inst = getinstrument(inst,opts,home)
+  if inst is not None:
+    instrumentconvert(inst)
+    inst.start()
   
-  (t,b) = getlayout(s)
+  try:
+    # Skip everything if the inputs and week match the last run's
+    state = getstate(configfile,rowanfile,opts,icsfile)
+    doweeks = opts.get('write-weeks','False').lower()=='true'
+    doical = opts.get('write-ical','False').lower()=='true'
+    doembed = opts.get('embed-schedule','False').lower()=='true'
+    outputs = [asciifile]
+    if dohtml:
+      outputs.append(htmlfile)
+    outputs += [snapshot.getsidecar(f) for f in outputs]
+    if doweeks:
+      outputs.append(getpath(WEEKS_FILE,home))
+    if doical:
+      outputs.append(getpath(ICAL_FILE,home))
+    if ((not force) and (state==readstate(statefile))
+        and all([os.path.isfile(f) for f in outputs])):
+      print 'No changes since last run'
+      return
+    
+    s = parse(configfile,rowanfile,snapfile,icsfile,cache)
+    if opts.get('layout','table').lower()=='grid':
+      (t,b) = (getgridlayout(s,opts),None)
+    else:
+      (t,b) = getlayout(s,logfile)
+    embedded = (s if doembed else None)
+    
+    try:
+      writeascii(t,b,asciifile,embedded)
+      snapshot.save(s,snapshot.getsidecar(asciifile))
+    except IOError:
+      print 'Could not write to ascii file "'+ASCII_FILE+'"'
+      sys.exit(0)
+    msg = 'Success making "'+ASCII_FILE+'"'
+    
+    if dohtml:
+      try:
+        writehtml(t,opts,htmlfile,embedded)
+        snapshot.save(s,snapshot.getsidecar(htmlfile))
+      except IOError:
+        print 'Could not write to html file "'+HTML_FILE+'"'
+        sys.exit(0)
+      msg += (' and "'+HTML_FILE+'"')
+    
+    if doweeks:
+      try:
+        (weeks,layouts) = writeweeks(s,opts,getpath(WEEKS_FILE,home),logfile)
+      except IOError:
+        print 'Could not write to html file "'+WEEKS_FILE+'"'
+        sys.exit(0)
+      msg += (' and '+str(weeks)+' weeks ('+str(layouts)+' layouts) in "'
+          +WEEKS_FILE+'"')
+    
+    if doical:
+      stamp = getmodified([configfile,rowanfile,icsfile])
+      try:
+        atomicwrite(functools.partial(ical.write,stamp=stamp),s,
+            getpath(ICAL_FILE,home))
+      except IOError:
+        print 'Could not write to iCalendar file "'+ICAL_FILE+'"'
+        sys.exit(0)
+      msg += (' and "'+ICAL_FILE+'"')
+    
+    writestate(state,statefile)
+    print msg
+  finally:
+    if inst is not None:
+      inst.stop(home=(home or os.path.expanduser('~')))
+
+def getinstrument(inst,opts,home=None):
+  """return inst or a new instrument.Instrument if the instrument option
+  is True, with its files set for the user with the given home directory,
+  or None if instrumentation is off"""
+  
+  if inst is None:
+    if opts.get('instrument','False').lower()!='true':
+      return None
+    inst = instrument.Instrument(profile=(opts.get('profile','False').lower()=='true'))
+  if inst.fname is None:
+    inst.fname = getpath(opts.get('instrument-file',STATS_FILE),home)
+  if inst.profile and (inst.proffile is None):
+    inst.proffile = getpath(PROFILE_FILE,home)
+  return inst
+
+def instrumentconvert(inst):
+  """time each stage of convert() and count calls to hot functions"""
+  
+  module = sys.modules[__name__]
+  for name in STAGES:
+    inst.stage(module,name)
+  inst.stage(snapshot,'load','snapshot.load')
+  inst.stage(schedule.Schedule,'getconflicts')
+  inst.count(meeting.Meeting,'conflicts','Meeting.conflicts')
+  for name in COUNTED:
+    inst.count(module,name)
 
+def getpath(fname,home=None):
+  """return the path of fname in the directory home or in the current
+  user's home directory, where fname is one of the ~/ file names above,
+  another path starting with ~, an absolute path or a path relative to
+  the home directory"""
+  
+  if home is None:
+    return os.path.expanduser(fname)
+  if fname.startswith('~/'):
+    return os.path.join(home,fname[2:])
+  return os.path.join(home,os.path.expanduser(fname))
+
+def batch(homes,processes=None,force=False,inst=None):
+  """convert the schedules of the users with the given home directories
+  in a pool of processes and return a list of result dicts, where each
+  user gets a copy of the instrument.Instrument inst if given"""
+  
+  pool = multiprocessing.Pool(processes)
   try:
-    writeascii(t,b,asciifile)
-  except IOError:
-    print 'Could not write to ascii file "'+ASCII_FILE+'"'
-    sys.exit(0)
-  msg = 'Success making "'+ASCII_FILE
+    results = pool.map(convertuser,[(home,force,inst) for home in homes],1)
+  finally:
+    pool.close()
+    pool.join()
+  return results
+
+def convertuser(args,cache=None):
+  """run convert() for (home,force,inst) and return a dict describing
+  how it went, catching any error so one user cannot stop a batch"""
   
-  opts = parsehtmlconfig(configfile)
+  (home,force,inst) = args
+  result = {'home':home,'success':True,'error':None}
+  start = time.time()
+  try:
+    convert(force,home,inst,cache)
+  except (Exception,SystemExit), e:
+    result['success'] = False
+    result['error'] = e.__class__.__name__+': '+str(e)
+  result['time'] = time.time()-start
+  return result
+
+def watch(homes,interval=WATCH_INTERVAL,delay=WATCH_DELAY,force=False,
+    inst=None):
+  """convert the schedules of the users with the given home directories
+  and then again whenever one of their WATCH_FILES changes, polling every
+  interval seconds and waiting until a user's files have not changed for
+  delay seconds, until interrupted. Only that user is converted again and
+  each user's parsed Schedule is kept between runs. Every user is also
+  converted again when a new week starts"""
+  
+  users = []
+  for home in homes:
+    users.append({'home':home,'stamp':getwatchstamp(home),'cache':{},
+        'changed':None})
+  week = getweekstart()
+  for user in users:
+    watchconvert(user,force,inst)
+  
+  while True:
+    time.sleep(interval)
+    now = time.time()
+    if getweekstart()!=week:
+      week = getweekstart()
+      for user in users:
+        user['changed'] = now-delay
+    
+    for user in users:
+      stamp = getwatchstamp(user['home'])
+      if stamp!=user['stamp']:
+        user['stamp'] = stamp
+        user['changed'] = now
+      elif (user['changed'] is not None) and (now-user['changed']>=delay):
+        user['changed'] = None
+        watchconvert(user,False,inst)
+
+def getwatchstamp(home):
+  """return the (path,size,mtime) of each of the WATCH_FILES of the user
+  with the given home directory"""
+  
+  return snapshot.getsources([getpath(fname,home) for fname in WATCH_FILES])
+
+def watchconvert(user,force=False,inst=None):
+  """convert the schedule of the watched user dict and print the result,
+  using a copy of the instrument.Instrument inst if given"""
+  
+  if inst is not None:
+    inst = copy.deepcopy(inst)
+  print time.strftime('%Y-%m-%d %H:%M:%S')+'  '+user['home']
+  result = convertuser((user['home'],force,inst),user['cache'])
+  printreport([result])
+  sys.stdout.flush()
+  return result
+
+def readmanifest(fname):
+  """return the home directories listed one per line in fname, ignoring
+  blank lines and lines starting with #"""
   
-  if opts.has_key('write-html') and opts['write-html'].lower()=='true':
+  homes = []
+  f = open(fname)
+  try:
+    for line in f:
+      line = line.strip()
+      if line and not line.startswith('#'):
+        homes.append(os.path.expanduser(line))
+  finally:
+    f.close()
+  return homes
+
+def printreport(results):
+  """print the success or failure and time of each batch result"""
+  
+  failed = 0
+  for result in results:
+    status = 'OK'
+    if not result['success']:
+      status = 'FAIL'
+      failed += 1
+    line = status.ljust(5)+('%.3fs' % result['time']).rjust(9)+'  '+result['home']
+    if result['error'] is not None:
+      line += ('  '+result['error'])
+    print line
+  print (str(len(results)-failed)+' succeeded, '+str(failed)+' failed')
+
+def parse(configfile,rowanfile,snapfile=None,icsfile=None,cache=None,
+    readonly=False):
+  """return a Schedule of the config, rowan and iCalendar files, loading
+  it from the snapshot snapfile instead if none has changed since, and
+  keeping the events of each file in the dict cache if given so that only
+  the files that have changed since are parsed again next time. If
+  readonly is True, snapfile is only read and never written"""
+  
+  inputs = getinputs(configfile,rowanfile,icsfile)
+  paths = [fname for (fname,_,_,_) in inputs]
+  stamps = dict([(fname,snapshot.getsources([fname])) for fname in paths])
+  if cache:
+    (s,changed) = parsecached(inputs,stamps,cache)
+    if changed and (snapfile is not None) and (not readonly):
+      savesnapshot(s,snapfile,paths)
+    return s
+  
+  s = None
+  if snapfile is not None:
+    s = snapshot.load(snapfile,paths)
+  if s is None:
+    s = schedule.Schedule()
+    for (fname,_,parser,required) in inputs:
+      s.addevents(parseinput(fname,parser,required))
+    if (snapfile is not None) and (not readonly):
+      savesnapshot(s,snapfile,paths)
+  
+  if cache is not None:
+    fillcache(s,inputs,stamps,cache)
+  return s
+
+def getinputs(configfile,rowanfile,icsfile=None):
+  """return (fname,type,parser,required) for each input file, where the
+  Schedule returned by parser(fname) only has events of the given Type
+  and a missing file is an error only if required"""
+  
+  inputs = ([(configfile,'Config',parseconfig,True),
+             (rowanfile,'Rowan',parserowan,False)])
+  if icsfile is not None:
+    inputs.append((icsfile,'iCalendar',parseical,False))
+  return inputs
+
+def parseinput(fname,parser,required=True):
+  """return a list of the events parser reads from fname, or an empty
+  list if fname does not exist and is not required"""
+  
+  if (not required) and (not os.path.isfile(fname)):
+    return []
+  
+  # Take the events out of their own Schedule so they only belong to the
+  # Schedule they are added to next
+  sched = parser(fname)
+  events = sched.getevents()
+  sched.removeevents()
+  return events
+
+def parsecached(inputs,stamps,cache):
+  """return (Schedule,changed) of the inputs, parsing only the files
+  whose stamp is not the one saved with their events in the dict cache"""
+  
+  parsed = {}
+  for (fname,_,parser,required) in inputs:
+    if cache.get(fname,(None,None))[0]!=stamps[fname]:
+      parsed[fname] = parseinput(fname,parser,required)
+  old = cache.get('sched')
+  if (old is not None) and (len(parsed)==0):
+    return (old,False)
+  
+  if old is not None:
+    old.removeevents()
+  for (fname,events) in parsed.items():
+    cache[fname] = (stamps[fname],events)
+  s = schedule.Schedule()
+  for (fname,_,_,_) in inputs:
+    s.addevents(cache[fname][1])
+  cache['sched'] = s
+  return (s,True)
+
+def fillcache(s,inputs,stamps,cache):
+  """save the events of the Schedule s in the dict cache by the input
+  file their Type says they came from, unless some Type is unknown"""
+  
+  for (fname,kind,_,_) in inputs:
+    cache[fname] = (stamps[fname],[e for e in s.events if e.getinfo('Type')==kind])
+  if sum([len(cache[fname][1]) for (fname,_,_,_) in inputs])!=len(s.events):
+    cache.clear()
+    return
+  cache['sched'] = s
+
+def savesnapshot(s,snapfile,sources):
+  """save a snapshot of s made from the files sources to snapfile if
+  possible"""
+  
+  try:
+    snapshot.save(s,snapfile,sources)
+  except (IOError,OSError):
+    pass
+
+def getstate(configfile,rowanfile,opts,icsfile=None):
+  """return a dict describing everything the output depends on"""
+  
+  return ({'config' : hashfile(configfile),
+           'rowan'  : hashfile(rowanfile),
+           'ical'   : icsfile and hashfile(icsfile),
+           'opts'   : opts,
+           'week'   : getweekstart().isoformat()})
+
+def getmodified(fnames):
+  """return the UTC dt.datetime the latest of the files fnames that exist
+  was modified, or None if none exist"""
+  
+  times = [os.path.getmtime(f) for f in fnames if os.path.isfile(f)]
+  if len(times)==0:
+    return None
+  return dt.datetime.utcfromtimestamp(int(max(times)))
+
+def readstate(statefile):
+  """return the state dict saved in statefile or None"""
+  
+  try:
+    f = open(statefile)
     try:
-      writehtml(t,opts,htmlfile)
-    except IOError:
-      print 'Could not write to html file "'+HTML_FILE+'"'
-      sys.exit(0)
-    msg += ('" and "'+HTML_FILE+'"')
+      return json.load(f)
+    finally:
+      f.close()
+  except (IOError,ValueError):
+    return None
+
+def writestate(state,statefile):
+  """save the state dict to statefile"""
   
-  print msg
+  atomicwrite(writejson,state,statefile)
+
+def writejson(obj,fname):
+  """write obj to fname as json"""
+  
+  f = open(fname,'w')
+  try:
+    json.dump(obj,f)
+  finally:
+    f.close()
+
+def hashfile(fname):
+  """return the sha1 hex digest of the contents of fname or None if it
+  does not exist"""
+  
+  if not os.path.isfile(fname):
+    return None
+  h = hashlib.sha1()
+  f = open(fname,'rb')
+  try:
+    for chunk in iter(lambda: f.read(64*1024),''):
+      h.update(chunk)
+  finally:
+    f.close()
+  return h.hexdigest()
+
+def atomicwrite(write,data,fname):
+  """call write(data,tmp) on a temporary file and move it over fname
+  unless fname already has the same bytes; return whether it changed"""
+  
+  tmp = fname+'.tmp'
+  write(data,tmp)
+  if os.path.isfile(fname) and filecmp.cmp(tmp,fname,shallow=False):
+    os.remove(tmp)
+    return False
+  os.rename(tmp,fname)
+  return True
+
+def writechunks(chunks,fname):
+  """write each string in the iterable chunks to fname as it is made"""
+  
+  f = open(fname,'w')
+  try:
+    for chunk in chunks:
+      f.write(chunk)
+  finally:
+    f.close()
+
+def writestream(render,fname):
+  """write fname by calling render(out) with an htmlstream.HtmlStream out
+  writing to it"""
+  
+  f = open(fname,'w')
+  try:
+    render(htmlstream.HtmlStream(f))
+  finally:
+    f.close()
 
 def writedefaultconfig(configfile):
   """write the default config to configfile"""
@@ -71,14 +534,29 @@ def writedefaultconfig(configfile):
   raise NotImplementedError
 
 def parsehtml(htmlfile):
-  """read the data from a schedconv webpage into a Schedule object"""
+  """read the data from a schedconv webpage into a Schedule object
+  Note that this loads the snapshot embedded by writehtml() or saved
+  next to the page by convert() and raises ValueError if there is none"""
   
-  raise NotImplementedError
+  return parseembedded(htmlfile)
   
 def parseascii(asciifile):
-  """read the data from a schedconv ascii file into a Schedule object"""
+  """read the data from a schedconv ascii file into a Schedule object
+  Note that this loads the snapshot embedded by writeascii() or saved
+  next to the file by convert() and raises ValueError if there is none"""
   
-  raise NotImplementedError
+  return parseembedded(asciifile)
+
+def parseembedded(fname):
+  """return the Schedule embedded in fname by snapshot.embed(), or else
+  the one in its sidecar snapshot, see snapshot.getsidecar()"""
+  
+  s = snapshot.loadembedded(fname)
+  if s is None:
+    s = snapshot.load(snapshot.getsidecar(fname))
+  if s is None:
+    raise ValueError('No schedule embedded in or saved next to "'+fname+'"')
+  return s
 
 def parseconfig(configfile):
   """read the data from a schedconv config file into a Schedule object"""
@@ -90,8 +568,9 @@ def parseconfig(configfile):
   if len(result)==0:
     raise IOError('File not found: "'+configfile+'"')
   sections = config.sections()
-  if 'HTML Options' in sections:
-    sections.remove('HTML Options')
+  for section in OPTION_SECTIONS:
+    if section in sections:
+      sections.remove(section)
   
   for section in sections:
     info = {}
@@ -105,6 +584,7 @@ def parseconfig(configfile):
     (info['Start Date'],info['End Date']) = parseconfigdates(config.get(section,'dates'))
     info['Location'] = config.get(section,'location')
     meetinfos = config.get(section,'meets').split(' ')
+    rows = []
     for meetinfo in meetinfos:
       days = meetinfo[:meetinfo.find('(')]
       times = meetinfo[meetinfo.find('(')+1:meetinfo.find(')')].split(',')
@@ -112,7 +592,8 @@ def parseconfig(configfile):
         info['Day'] = day
         for time in times:
           (info['Start Time'],info['End Time']) = parseconfigtimes(time)
-          eve.addmeet(meeting.Meeting(info,eve))
+          rows.append(dict(info))
+    eve.addmeets(meeting.Meeting.frombatch(rows,eve))
     sched.addevent(eve)
   
   return sched
@@ -187,40 +668,29 @@ def parserowan(htmlfile):
   Note that any classes with invalid dates or times (e.g. "TBD")
   will be ignored and not added to the schedule"""
   
-  sched = schedule.Schedule()
+  sched = schedule.Schedule(indexes=['CRN'])
   
-  lines = qf.readlinesbs(htmlfile)
-  (tablestart,_) = util.findinlist('Display course details for a student',lines)
-  (tablestop,_) = util.findinlist('</table>',lines,tablestart+1,ignorecase=True)
-  starts = util.findallinlist('<tr>',lines,tablestart+1,tablestop,ignorecase=True)
-  stops = util.findallinlist('</tr>',lines,tablestart+1,tablestop,ignorecase=True)
-  
-  # Ignore first (table headers) and last (total credits) <tr></tr>
-  starts = [x[0] for x in starts[1:-1]]
-  stops = [x[0] for x in stops[1:-1]]
-  
-  for start in starts:
+  for row in rowanparser.iterrows(htmlfile):
+    if len(row)<len(COLUMNS):
+      continue
     
     # Build event.Class info
     info = {}
     for i in range(0,EVENT_COLS):
-      l = lines[start+1+i]
-      if '&nbsp;' in l:
+      if '&nbsp;' in row[i]:
         info = sched.events[-1].getinfo()
         break
-      info[COLUMNS[i]] = innermosthtml(l).strip()
+      info[COLUMNS[i]] = row[i]
     eve = parserowanevent(info)
     
     # Build meeting.Meeting info
     info = {}
     for i in range(EVENT_COLS,len(COLUMNS)):
-      l = lines[start+1+i]
-      info[COLUMNS[i]] = innermosthtml(l).strip()
+      info[COLUMNS[i]] = row[i]
     
     # Check for fake classes (i.e. Honors Participation)
-    try:
-      meets = parserowanmeet(info,eve)
-    except ValueError:
+    meets = parserowanmeet(info,eve)
+    if meets is None:
       continue
     
     # If the Class does not exist, add it to sched, else add the meet
@@ -234,33 +704,17 @@ def parserowan(htmlfile):
       
   return sched
 
-def istagged(l):
-  """return whether all of l is in an html tag"""
-  
-  l = l.strip()
-  try:
-    openleft = l.find('<')
-    openright = l.find('>')
-    closeleft = l.rfind('</')
-    closeright = l.rfind('>')
-  except:
-    return False
-  return ((openleft==0) and (closeright==len(l)-1) and (openleft<openright)
-      and (openright<closeleft) and (closeleft<closeright))
-
-def innermosthtml(l):
-  """return the innerhtml of all the tags in l"""
-  
-  while istagged(l):
-    l = innerhtml(l).strip()
-  return l
-
-def innerhtml(l):
-  """return the innerhtml of the outtermost tag in l"""
-  
-  openstop = l.find('>')
-  closestart = l.rfind('</')
-  return l[openstop+1:closestart]
+def parseical(icsfile):
+  """read the weekly events of an iCalendar file into a Schedule object
+  Note that events that cannot be shown as weekly meetings (e.g. monthly
+  or all-day events) will be ignored and not added to the schedule"""
+  
+  (sched,skipped) = ical.read(icsfile)
+  if len(skipped)>0:
+    print ('Ignored '+str(len(skipped))+' events in "'+CALENDAR_FILE+'" ('
+        +'; '.join([summary+': '+reason for (summary,reason) in skipped[:3]])
+        +('; ...' if len(skipped)>3 else '')+')')
+  return sched
 
 def parserowanevent(info):
   """convert strings to correct types"""
@@ -271,23 +725,26 @@ def parserowanevent(info):
   return event.Class(info)
 
 def parserowanmeet(info,eve):
-  """convert strings to correct types"""
+  """convert strings to correct types, or return None if the dates or
+  times cannot be read (e.g. "TBD"); any other invalid values raise"""
   
-  info['Start Date'] = parserowandate(info['Start Date'])
-  info['End Date'] = parserowandate(info['End Date'])
-  (info['Start Time'],info['End Time']) = parserowantimes(info['Time'])
+  try:
+    info['Start Date'] = parserowandate(info['Start Date'])
+    info['End Date'] = parserowandate(info['End Date'])
+    (info['Start Time'],info['End Time']) = parserowantimes(info['Time'])
+  except ValueError:
+    return None
   del info['Time']
   
   days = info['Day']
   if len(days)==1:
     return meeting.ClassMeeting(info,eve)
   
-  meets = []
+  rows = []
   for day in days:
     info['Day'] = day
-    meet = meeting.ClassMeeting(info,eve)
-    meets.append(meet)
-  return meets
+    rows.append(dict(info))
+  return meeting.ClassMeeting.frombatch(rows,eve)
 
 def parserowandate(s):
   """convert the string to a dt.date"""
@@ -324,37 +781,45 @@ def parserowantime(s):
     hr += 12
   return dt.time(hr,mins)
 
-def getlayout(s):
-  """decide where to put entries in the schedule"""
+def getlayout(s,logfile=None,week=None):
+  """decide where to put entries in the schedule for the week containing
+  the dt.date week (default this week)"""
   
   conflicts = s.getconflicts()
   if len(conflicts)>0:
-    writeconflicts(conflicts)
-    raise RuntimeError('Cannot layout a schedule with conflicts; see ~/sched.log')
+    logfile = writeconflicts(conflicts,logfile)
+    raise RuntimeError('Cannot layout a schedule with conflicts; see '+logfile)
+  
+  # Only layout meets that are active based on dates
+  return layoutdays(getweekmeets(s,week))
+
+def getweekmeets(s,week=None):
+  """return a list of the meets of s active on each day of the week
+  containing the dt.date week (default this week)"""
+  
+  weekstart = getweekstart(week)
+  calendar = s.getcalendar()
+  return [calendar.ondate(weekstart+dt.timedelta(days=d)) for d in range(0,7)]
+
+def getfingerprint(days):
+  """return a hashable value that is equal for two results of
+  getweekmeets() exactly when they would have the same layout"""
+  
+  return tuple([tuple([id(meet) for meet in meets]) for meets in days])
+
+def layoutdays(days):
+  """decide where to put the meets on each day of the week in the table"""
   
   # Create blank sched matrix
   table = util.matrix(8,7,None)
   
-  days = meeting.DAYS
   for d in range(0,7):
-    allmeets = s.getmeets(search={'Day':days[d]})
-    
-    # Only layout meets that are active based on dates
-    meets = []
-    today = dt.date.today()
-    weekday = today.isoweekday()%7   # 0 is Sunday, 6 is Saturday
-    weekstart = today-dt.timedelta(days=weekday)
-    weekend = weekstart+dt.timedelta(days=6)
     
-    for m in allmeets:
-      if (m.getfirstmeet()<=weekend) and (m.getlastmeet()>=weekstart):
-        meets.append(m)
-
     # If there are more than 8 meets, they won't fit, throw an error
-    if len(meets)>8:
-      raise RuntimeError('Too many meets on '+days[d]+' to layout')
+    if len(days[d])>8:
+      raise RuntimeError('Too many meets on '+meeting.DAYS[d]+' to layout')
     
-    meets.sort(key=(lambda meet: meet.getinfo('Start Time')))
+    meets = sorted(days[d],key=(lambda meet: meet.startmin))
     for meet in meets:
       
       # Set based on start time or in next available slot if occupied
@@ -395,6 +860,26 @@ def getlayout(s):
   borders = getborders(table)
   return (table,borders)
 
+def getgridlayout(s,opts,week=None):
+  """return a layout.Layout of s using the grid options in opts, where
+  overlapping meetings are shown side by side instead of refused"""
+  
+  return layout.place(s,week,*getgridopts(opts))
+
+def getgridopts(opts):
+  """return the (start,end,resolution) grid options in opts as ints"""
+  
+  return (int(opts.get('grid-start','8')),int(opts.get('grid-end','24')),
+      int(opts.get('grid-resolution','5')))
+
+def getweekstart(today=None):
+  """return the dt.date of the Sunday starting the week of today"""
+  
+  if today is None:
+    today = dt.date.today()
+  weekday = today.isoweekday()%7   # 0 is Sunday, 6 is Saturday
+  return today-dt.timedelta(days=weekday)
+
 def getstartind(meet,info):
   """return the index in the matrix best matching the start time"""
   
@@ -629,10 +1114,22 @@ def getborders(table):
 def writetxt(sched,outfile,):
   """write the schedule to a text file"""
   
-  qf.write(sched.strf(),outfile)
+  writechunks(sched.iterstrf(),outfile)
+  
+def writeascii(table,borders,fname,sched=None):
+  """write the schedule to a text file as an ascii table, followed by a
+  snapshot of the Schedule sched for parseascii() if given"""
   
-def writeascii(table,borders,fname):
-  """write the schedule to a text file as an ascii table"""
+  if isinstance(table,layout.Layout):
+    chunks = ascii_itergrid(table)
+  else:
+    chunks = ascii_iterrows(table,borders)
+  if sched is not None:
+    chunks = itertools.chain(chunks,[line+'\n' for line in snapshot.embed(sched)])
+  atomicwrite(writechunks,chunks,fname)
+
+def ascii_iterrows(table,borders):
+  """generate the lines of the ascii table"""
   
   infos = [gettitlestr,getlocstr,gettimestr]
   s = '     '
@@ -641,11 +1138,11 @@ def writeascii(table,borders,fname):
   multifill = ['|  |  |','|  |  |','V  V  V']
   for day in days:
     s += (center(day,13)+' ')
-  s += '\n'
-  s += (' 8A +'+('-------------+'*7)+'\n')
+  yield s+'\n'
+  yield (' 8A +'+('-------------+'*7)+'\n')
   for row in range(0,8):
     for i in range(0,3):
-      s += '    |'
+      s = '    |'
       for col in range(0,7):
         meet = table[row][col]
         if meet is None:
@@ -661,8 +1158,8 @@ def writeascii(table,borders,fname):
               s += (' '+infos[i](meet)+' |')
             else:
               s += (center(multifill[i],13)+'|')
-      s += '\n'
-    s += (times[row+1]+' +')
+      yield s+'\n'
+    s = (times[row+1]+' +')
     if row==7:
       s += ('-------------+'*7+'\n')
     else:
@@ -671,9 +1168,59 @@ def writeascii(table,borders,fname):
           s += '-------------+'
         else:
           s += '             +'
-    s += '\n'
-    
-  qf.write(s,fname)
+    yield s+'\n'
+
+def ascii_itergrid(lay):
+  """generate the lines of a layout.Layout as an ascii table with one
+  line per row"""
+  
+  infos = [gettitlestr,getlocstr,gettimestr]
+  days = ['Sunday','Monday','Tuesday','Wednesday','Thursday','Friday','Saturday']
+  s = ' '*8
+  for day in days:
+    s += (center(day,13)+' ')
+  yield s+'\n'
+  border = ' '*7+'+'+('-------------+'*7)+'\n'
+  yield border
+  grid = lay.getgrid()
+  widths = [getsubwidths(lay.columns[d],13) for d in range(0,7)]
+  for row in range(0,lay.rows):
+    t = lay.gettime(row)
+    label = ''
+    if t.minute==0:
+      label = gettimelabel(t)
+    s = (label.rjust(6)+' |')
+    for d in range(0,7):
+      cells = []
+      col = 0
+      while col<lay.columns[d]:
+        cell = grid[row][d][col]
+        if cell is None:
+          cells.append(' '*widths[d][col])
+          col += 1
+          continue
+        (p,offset) = cell
+        width = sum(widths[d][p.col:p.col+p.cols])+p.cols-1
+        if offset<len(infos):
+          text = infos[offset](p.meet).strip()
+        elif offset==p.rows-1:
+          text = 'V'
+        else:
+          text = '|'
+        cells.append(center(text[:width],width))
+        col += p.cols
+      s += (':'.join(cells)+'|')
+    yield s+'\n'
+  yield border
+
+def getsubwidths(cols,width):
+  """return the widths of cols sub-columns separated by one character
+  that together fill width characters"""
+  
+  base = (width-cols+1)//cols
+  widths = [base]*cols
+  widths[-1] += (width-cols+1-base*cols)
+  return widths
 
 def getmultimeetind(matrix,row,col):
   """return the row index at the end of this sequence of 'MULTI'"""
@@ -699,57 +1246,13 @@ def center(s,length,fill=' '):
 def gettitlestr(meet):
   """return the formatted title string of meet"""
   
-  title = meet.event.getinfo('Title').upper()
-  
-  delete = ['SOC SCI:','LITERATURE:','SEMINAR: ','ST:','ST ECE:']
-  for d in delete:
-    title = title.replace(d,'')
-  
-  replace = ([['INTRODUCTION','I'],
-              ['INTRO','I'],
-              ['I TO','I'],
-              ['HONORS','H'],
-              ['HONOR','H'],
-              ['HONR','H'],
-              ['ELECTRICAL','ELEC'],
-              ['ENGINEERING','ENG'],
-              ['COMPUTER SCIENCE','CS'],
-              ['COMPUTERS','COMP'],
-              ['COMPUTER','COMP'],
-              [' AND ',' & '],
-              ['- ',''],
-              ['HISTORY','HIST'],
-              ['MATHEMATICAL','MATH'],
-              ['TECHNOLOGIES','TECH'],
-              ['TECHNOLOGY','TECH'],
-              ['STATISTICS','STAT'],
-              ['DIGITAL','DIG'],
-              ['READINGS IN','READ'],
-              ['FRESHMAN','FRESH'],
-              ['SOPHOMOE','SOPH'],
-              ['JUNIOR','JUN'],
-              ['SENIO','SEN']])
-  for pair in replace:
-    title = title.replace(pair[0],pair[1])
-  
+  title = ABBREVIATIONS['title'].abbrev(meet.event.getinfo('Title').upper())
   return center(title[:11].title(),11)
 
 def getlocstr(meet):
   """return the formatted location string of meet"""
   
-  loc = meet.getinfo('Location').upper()
-  
-  delete = [' HALL',' CENTER',' BUILDING',' BLDG','CL-']
-  for d in delete:
-    loc = loc.replace(d,'')
-  
-  replace = ([['ROBINSON','ROBIN'],
-              ['WHITNEY','WHIT'],
-              ['ENTERPRISE','ENTERP'],
-              ['HAWTHORNE','HAWTH']])
-  for pair in replace:
-    loc = loc.replace(pair[0],pair[1])
-  
+  loc = ABBREVIATIONS['location'].abbrev(meet.getinfo('Location').upper())
   return center(loc.title()[:11],11)
 
 def gettimestr(meet):
@@ -764,6 +1267,14 @@ def gettimestr(meet):
   return center(str(shr)+':'+str(smi).zfill(2)+'-'
       +str(ehr)+':'+str(emi).zfill(2),11)
 
+def gettimelabel(t):
+  """return the dt.time t formatted like 8:30A"""
+  
+  ampm = 'A'
+  if t.hour>=12:
+    ampm = 'P'
+  return str(twelvehr(t.hour))+':'+str(t.minute).zfill(2)+ampm
+
 def twelvehr(hr):
   """convert hr from 24 hour to 12 hour format"""
   
@@ -788,8 +1299,35 @@ def parsehtmlconfig(configfile):
     opts[pair[0]] = pair[1]
   return opts
 
-def writehtml(table,opts,fname):
-  """write the schedule to an html file using CSS opts"""
+def parseabbrevconfig(configfile):
+  """return {'title':[(old,new),...],'location':[...]} with the rules from
+  the [Abbreviations] section of the config file for each option given"""
+  
+  config = cp.RawConfigParser()
+  result = config.read(configfile)
+  if len(result)==0:
+    raise IOError('File not found: "'+configfile+'"')
+  rules = {}
+  if 'Abbreviations' in config.sections():
+    for (name,value) in config.items('Abbreviations'):
+      if name not in ABBREVIATIONS:
+        raise ValueError('Unknown abbreviation option "'+name+'"')
+      rules[name] = abbrev.parserules(value)
+  return rules
+
+def setabbreviations(rules):
+  """use the rules from parseabbrevconfig() for titles and locations,
+  and the defaults for any not given"""
+  
+  defaults = {'title':TITLE_RULES,'location':LOCATION_RULES}
+  for (name,default) in defaults.items():
+    new = rules.get(name,default)
+    if new!=ABBREVIATIONS[name].rules:
+      ABBREVIATIONS[name] = abbrev.Abbreviator(new)
+
+def writehtml(table,opts,fname,sched=None):
+  """write the schedule to an html file using CSS opts, with a snapshot
+  of the Schedule sched in a comment for parsehtml() if given"""
   
   default = ({'write-html':'False',
               'title':'Schedule',
@@ -804,18 +1342,30 @@ def writehtml(table,opts,fname):
               'table-only':'False'})
   
   opts = util.fillargs(opts,default)
-  if opts['table-only'].lower()=='true':
-    lines = tag('table',tab(html_gettable(table)))
-  else:
-    lines = tag('html',tab(html_gethtml(table,opts)))
-  qf.writelinesn(lines,fname)
+  atomicwrite(writestream,functools.partial(html_write,table,opts,sched=sched),fname)
 
-def html_gethtml(table,opts):
-  """return the content of the <html></html> tags"""
+def html_write(table,opts,out,sched=None):
+  """write the html page or just the table to the htmlstream.HtmlStream
+  out, starting with a comment holding a snapshot of sched if given"""
   
-  lines = tag('head',tab(html_gethead(table,opts)))
-  lines += tag('body',tab(html_getbody(table,opts)))
-  return lines
+  if sched is not None:
+    lines = snapshot.embed(sched)
+    out.writelines(['<!-- '+lines[0]]+lines[1:-1]+[lines[-1]+' -->'])
+  
+  if opts['table-only'].lower()=='true':
+    out.open('table')
+    html_writetable(table,out)
+    out.close()
+    return
+  
+  out.open('html')
+  out.tag('head',html_gethead(table,opts))
+  out.open('body')
+  out.open('table')
+  html_writetable(table,out)
+  out.close()
+  out.close()
+  out.close()
 
 def html_gethead(table,opts):
   """return the content of the <head></head> tags"""
@@ -827,6 +1377,9 @@ def html_gethead(table,opts):
 def html_getstyle(table,opts):
   """return the content of the CSS <style></style> tags"""
   
+  if isinstance(table,layout.Layout):
+    return html_getgridstyle(table,opts)
+  
   lines = css('body',{
       'background':opts['page-bg-color'],
       'font-family':opts['font-family']})
@@ -857,17 +1410,48 @@ def html_getstyle(table,opts):
       'top':'24px'})
   return lines
 
-def html_getbody(table,opts):
-  """return the content of the <body></body> tags"""
+def html_getgridstyle(lay,opts):
+  """return the CSS for a layout.Layout, scaling rows to its resolution"""
   
-  return tag('table',tab(html_gettable(table)))
+  height = str(max(1,75*lay.resolution//120))+'px'
+  lines = css('body',{
+      'background':opts['page-bg-color'],
+      'font-family':opts['font-family']})
+  if opts['border-collapse']=='True':
+    lines += css('table',{
+        'border-collapse':'collapse'})
+  lines += css('td',{
+      'background':opts['empty-cell-bg-color'],
+      'border-left':'solid 3px '+opts['border-color'],
+      'border-right':'solid 3px '+opts['border-color'],
+      'text-align':'center',
+      'min-width':'40px',
+      'height':height,
+      'padding':'0px'})
+  lines += css('td.full',{
+      'color':opts['event-cell-font-color'],
+      'background':opts['event-cell-bg-color'],
+      'border':'solid 3px '+opts['border-color']})
+  lines += css('th',{
+      'color':opts['header-font-color']})
+  lines += css('th.time',{
+      'text-align':'right',
+      'vertical-align':'top',
+      'font-size':'small',
+      'height':height,
+      'padding':'0px 8px 0px 0px'})
+  return lines
 
-def html_gettable(table):
-  """return the content of the <table></table> tags"""
+def html_writetable(table,out):
+  """write the content of the <table></table> tags to out"""
   
-  lines = tag('tr',tab(html_gettableheader()))
-  lines += html_getrows(table)
-  return lines
+  if isinstance(table,layout.Layout):
+    html_writegrid(table,out)
+    return
+  
+  out.tag('tr',html_gettableheader())
+  for row in range(0,8):
+    out.tag('tr',html_getrow(table,row))
   
 def html_gettableheader():
   """return the table header row"""
@@ -878,14 +1462,6 @@ def html_gettableheader():
     lines += [tags('th',day)]
   return lines
   
-def html_getrows(table):
-  """return the table rows"""
-  
-  lines = []
-  for row in range(0,8):
-    lines += tag('tr',tab(html_getrow(table,row)))
-  return lines
-
 def html_getrow(table,row):
   """return the specified row"""
   
@@ -910,6 +1486,34 @@ def html_getrow(table,row):
           lines += comment(['placeholder due to rowspan'])
   return lines
 
+def html_writegrid(lay,out):
+  """write the table rows for a layout.Layout to out"""
+  
+  lines = [tags('th',space(1))]
+  days = ['Sunday','Monday','Tuesday','Wednesday','Thursday','Friday','Saturday']
+  for (d,day) in enumerate(days):
+    lines += [tags('th',day,{'colspan':str(lay.columns[d])})]
+  out.tag('tr',lines)
+  
+  grid = lay.getgrid()
+  for row in range(0,lay.rows):
+    t = lay.gettime(row)
+    label = space(1)
+    if t.minute==0:
+      label = gettimelabel(t)
+    cells = [tags('th',label,{'class':'time'})]
+    for d in range(0,7):
+      for col in range(0,lay.columns[d]):
+        cell = grid[row][d][col]
+        if cell is None:
+          cells += [tags('td',space(1))]
+        else:
+          (p,offset) = cell
+          if (offset==0) and (col==p.col):
+            cells += [tags('td',html_getcell(p.meet),{'class':'full',
+                'rowspan':str(p.rows),'colspan':str(p.cols)})]
+    out.tag('tr',cells)
+
 def html_getcell(meet):
   """return the cell info for this meet"""
   
@@ -918,14 +1522,199 @@ def html_getcell(meet):
   time = gettimestr(meet).strip()
   return (title+br(1)+loc+br(1)+time)
 
-def writeoverlap(title,users):
+def writeweeks(s,opts,indexfile,logfile=None):
+  """write an html page of s for each week from the weeks-start option to
+  the weeks-end option in the directory of indexfile and an index linking
+  them to indexfile, laying out each distinct set of active meets only
+  once, and return the number of (weeks,layouts)"""
+  
+  (start,end) = getweekrange(s,opts)
+  grid = opts.get('layout','table').lower()=='grid'
+  if not grid:
+    conflicts = s.getconflicts()
+    if len(conflicts)>0:
+      logfile = writeconflicts(conflicts,logfile)
+      raise RuntimeError('Cannot layout a schedule with conflicts; see '+logfile)
+  
+  # Most weeks of a semester have the same meets, so reuse their layout
+  layouts = {}
+  pages = []
+  title = opts.get('title','Schedule')
+  week = getweekstart(start)
+  while week<=end:
+    days = getweekmeets(s,week)
+    key = getfingerprint(days)
+    if key not in layouts:
+      if grid:
+        layouts[key] = (layout.placedays(days,week,*getgridopts(opts)),None)
+      else:
+        layouts[key] = layoutdays(days)
+    (t,b) = layouts[key]
+    
+    name = week.strftime(WEEK_PAGE)
+    weekopts = dict(opts)
+    weekopts['title'] = title+' - '+getweekname(week)
+    writehtml(t,weekopts,os.path.join(os.path.dirname(indexfile),name))
+    pages.append((getweekname(week),name))
+    week += dt.timedelta(days=7)
+  
+  atomicwrite(writestream,functools.partial(weeks_write,title,pages),indexfile)
+  return (len(pages),len(layouts))
+
+def getweekrange(s,opts):
+  """return the (first,last) dt.dates to write weeks for from the
+  weeks-start and weeks-end options, by default the first and last dates
+  of the Rowan classes in s or else 16 weeks starting this week"""
+  
+  dates = []
+  for eve in s.events:
+    if eve.getinfo('Type')=='Rowan':
+      for meet in eve.meets:
+        dates += [meet.getfirstmeet(),meet.getlastmeet()]
+  if len(dates)>0:
+    (first,last) = (min(dates),max(dates))
+  else:
+    first = getweekstart()
+    last = first+dt.timedelta(weeks=15,days=6)
+  if 'weeks-start' in opts:
+    first = parseconfigdate(opts['weeks-start'])
+  if 'weeks-end' in opts:
+    last = parseconfigdate(opts['weeks-end'])
+  return (first,last)
+
+def getweekname(week):
+  """return the name of the week starting on the dt.date week"""
+  
+  return 'Week of '+week.strftime('%b %d, %Y')
+
+def weeks_write(title,pages,out):
+  """write the index of (name,fname) week pages to the
+  htmlstream.HtmlStream out"""
+  
+  out.open('html')
+  out.tag('head',[tags('title',title)])
+  out.open('body')
+  out.write(tags('h1',title))
+  out.tag('ul',[tags('li',tags('a',name,{'href':fname})) for (name,fname) in pages])
+  out.close()
+  out.close()
+
+def writeoverlap(title,users,fname=None,week=None,resolution=30,start=8,end=24):
   """write an overlap view schedule to an html file where users is
-  a dict with keys of 'username' and values of {'name':'','color':''}"""
+  a dict with keys of 'username' and values of {'name':'','color':''}
+  showing who is busy in each resolution minute slot from the hour start
+  to the hour end during the week containing week (default this week).
+  Users whose schedules cannot be read are skipped, listed on the page
+  and on stderr, and returned as a list of (username,error)"""
+  
+  if fname is None:
+    fname = os.path.expanduser(OVERLAP_FILE)
+  if week is None:
+    week = dt.date.today()
+  
+  # Reduce each user's schedule to one bitset of the week's slots, using
+  # their snapshots if current but never writing to their home directory
+  names = []
+  bitsets = []
+  skipped = []
+  for name in sorted(users.keys()):
+    home = os.path.expanduser('~'+name)
+    try:
+      s = parse(getpath(CONFIG_FILE,home),getpath(ROWAN_FILE,home),
+          getpath(SNAPSHOT_FILE,home),getpath(CALENDAR_FILE,home),
+          readonly=True)
+    except Exception, e:
+      error = e.__class__.__name__+': '+str(e)
+      print >>sys.stderr,'Skipping user "'+name+'": '+error
+      skipped.append((name,error))
+      continue
+    names.append(name)
+    bitsets.append(occupancy.getbits(s,week,resolution))
+  anybusy = occupancy.getunion(bitsets)
+  
+  rows = overlap_iterrows(users,names,bitsets,anybusy,resolution,start,end)
+  atomicwrite(writestream,functools.partial(overlap_write,title,users,names,
+      rows,skipped),fname)
+  return skipped
+
+def overlap_write(title,users,names,rows,skipped,out):
+  """write the overlap page with the table rows to the
+  htmlstream.HtmlStream out, followed by a note of the skipped users"""
+  
+  lines = [tags('title',title)]
+  lines += tag('style',tab(overlap_getstyle(users,names)))
+  out.open('html')
+  out.tag('head',lines)
+  out.open('body')
+  out.write(tags('h1',title))
+  out.open('table')
+  out.tag('tr',overlap_gettableheader())
+  for row in rows:
+    out.tag('tr',row)
+  out.close()
+  if len(skipped)>0:
+    missing = [users[name].get('name',name) for (name,error) in skipped]
+    out.write(tags('p','Could not read the schedules of: '+', '.join(missing)))
+  out.close()
+  out.close()
+
+def overlap_getstyle(users,names):
+  """return the CSS for the overlap page with a class for each user"""
   
-  raise NotImplementedError
+  lines = css('body',{
+      'background':'#FFFFFF',
+      'font-family':'Verdana'})
+  lines += css('table',{
+      'border-collapse':'collapse'})
+  lines += css('td',{
+      'background':'#808080',
+      'border':'solid 1px #000000',
+      'text-align':'center',
+      'width':'120px',
+      'font-size':'small'})
+  lines += css('td.full',{
+      'background':'#FFFFFF'})
+  lines += css('th.time',{
+      'text-align':'right',
+      'font-size':'small'})
+  for (i,name) in enumerate(names):
+    lines += css('div.user'+str(i),{
+        'background':users[name].get('color','#FFFFFF')})
+  return lines
 
-def writeconflicts(conflicts):
-  """write the conflicts to the log file"""
+def overlap_gettableheader():
+  """return the overlap table header row"""
+  
+  lines = [tags('th',space(1))]
+  days = ['Sunday','Monday','Tuesday','Wednesday','Thursday','Friday','Saturday']
+  for day in days:
+    lines += [tags('th',day)]
+  return lines
+
+def overlap_iterrows(users,names,bitsets,anybusy,resolution,start,end):
+  """generate the cells of each overlap table row, listing the users busy
+  in each slot"""
+  
+  slots = occupancy.getslots(resolution)
+  first = start*60//resolution
+  last = min(end*60//resolution,slots)
+  for i in range(first,last):
+    label = gettimelabel(meeting.unpacktime(i*resolution))
+    row = [tags('th',label,{'class':'time'})]
+    for d in range(0,7):
+      if not occupancy.isset(anybusy,d,i,resolution):
+        row += [tags('td',space(1))]
+        continue
+      cell = ''
+      for (u,bits) in enumerate(bitsets):
+        if occupancy.isset(bits,d,i,resolution):
+          name = users[names[u]].get('name',names[u])
+          cell += tags('div',name,{'class':'user'+str(u)})
+      row += [tags('td',cell,{'class':'full'})]
+    yield row
+
+def writeconflicts(conflicts,logfile=None):
+  """write the conflicts to the log file and return its path"""
   
   count = 1
   lines = []
@@ -936,8 +1725,61 @@ def writeconflicts(conflicts):
     lines += [gettimestr(m1)+' '+m1.event.getinfo('Title')]
     lines += [gettimestr(m2)+' '+m2.event.getinfo('Title'),'']
   
-  logfile = os.path.expanduser(LOG_FILE)
+  if logfile is None:
+    logfile = os.path.expanduser(LOG_FILE)
   qf.writelinesn(lines,logfile)
+  return logfile
+
+def main(args=None):
+  """parse command line arguments and run"""
+  
+  parser = argparse.ArgumentParser(description='Generate a graphical schedule')
+  parser.add_argument('homes',nargs='*',
+      help='home directories of users to convert (default: your own)')
+  parser.add_argument('-m','--manifest',
+      help='file listing home directories to convert, one per line')
+  parser.add_argument('-j','--jobs',type=int,default=None,
+      help='number of processes for converting several users')
+  parser.add_argument('-f','--force',action='store_true',
+      help='regenerate output even if nothing has changed')
+  parser.add_argument('-i','--instrument',nargs='?',const='',metavar='FILE',
+      help='append stage timings and call counts as JSON to FILE '
+      +'(default: '+STATS_FILE+')')
+  parser.add_argument('-p','--profile',metavar='FILE',
+      help='also write cProfile stats to FILE')
+  parser.add_argument('-w','--watch',action='store_true',
+      help='keep running and convert a user again when their files change')
+  parser.add_argument('--interval',type=float,default=WATCH_INTERVAL,
+      help='seconds between checks for changes when watching '
+      +'(default: '+str(WATCH_INTERVAL)+')')
+  parser.add_argument('--delay',type=float,default=WATCH_DELAY,
+      help='seconds files must be unchanged before converting when '
+      +'watching (default: '+str(WATCH_DELAY)+')')
+  args = parser.parse_args(args)
+  
+  inst = None
+  if (args.instrument is not None) or (args.profile is not None):
+    inst = instrument.Instrument(args.instrument or None,
+        args.profile is not None,args.profile)
+  
+  homes = args.homes
+  if args.manifest is not None:
+    homes += readmanifest(args.manifest)
+  if args.watch:
+    try:
+      watch(homes or [os.path.expanduser('~')],args.interval,args.delay,
+          args.force,inst)
+    except KeyboardInterrupt:
+      pass
+    return
+  if len(homes)==0:
+    convert(args.force,None,inst)
+    return
+  
+  results = batch(homes,args.jobs,args.force,inst)
+  printreport(results)
+  if not all([result['success'] for result in results]):
+    sys.exit(1)
 
 if __name__ == '__main__':
-  convert()
+  main()
@@ -4,16 +4,30 @@
 #
 # Author: Joshua A Haas
 
-import event
+import event,meeting
+import slotmatrix,calendarindex,columnar
+
+ENGINES = ['sweep','pairwise','columnar']
+if slotmatrix.np is not None:
+  ENGINES.append('bitmap')
 
 class Schedule:
   
-  def __init__(self,events=None):
-    """create a new schedule to keep track of events with meetings"""
+  def __init__(self,events=None,indexes=None):
+    """create a new schedule to keep track of events with meetings,
+    optionally keeping hash indexes on the given info fields"""
     
     self.events = []
+    self.positions = {}
+    self.eventindex = {}
+    self.meetindex = {}
+    self.calendar = None
+    self.columns = None
+    if indexes is not None:
+      for field in indexes:
+        self.addindex(field)
     if events is not None:
-      self.events = self.addevents(events)
+      self.addevents(events)
   
   def __eq__(self,obj):
     """override == operator"""
@@ -37,19 +51,22 @@ class Schedule:
     if (types is None) and (fields is None) and (meet is None):
       return range(0,len(self.events))
     
+    # Only scan events found in an index if any search field is indexed
+    candidates = self.lookup(self.eventindex,fields)
+    if candidates is None:
+      matches = self.lookup(self.meetindex,meet)
+      if matches is not None:
+        candidates = sorted(set([i for (i,j) in matches]))
+    if candidates is None:
+      candidates = range(0,len(self.events))
+    
     matches = []
-    for (i,eve) in enumerate(self.events):
+    for i in candidates:
+      eve = self.events[i]
       if (types is not None) and (not issubclass(eve.__class__,types)):
         continue
-      if fields is not None:
-        match = True
-        info = eve.getinfo()
-        for key in fields.keys():
-          if (key not in info) or (info[key]!=fields[key]):
-            match = False
-            break
-        if not match:
-          continue
+      if (fields is not None) and (not matchinfo(eve.getinfo(),fields)):
+        continue
       if (meet is not None) and (len(eve.getmeetinds(meet))==0):
         continue
       matches.append(i)
@@ -70,6 +87,11 @@ class Schedule:
         for j in range(0,len(self.events[i].meets)):
           x.append((i,j))
       return x
+    
+    candidates = self.lookup(self.meetindex,search)
+    if candidates is not None:
+      return [(i,j) for (i,j) in candidates
+          if matchinfo(self.events[i].meets[j].getinfo(),search)]
       
     matches = []
     for (i,eve) in enumerate(self.events):
@@ -78,12 +100,141 @@ class Schedule:
         matches.append((i,j))
     return matches
 
+  def lookup(self,index,search):
+    """return the sorted indices from index for the most selective
+    indexed field in search, or None if no field in search is indexed"""
+    
+    if search is None:
+      return None
+    best = None
+    for key in search.keys():
+      if key in index:
+        matches = index[key].get(search[key],[])
+        if (best is None) or (len(matches)<len(best)):
+          best = matches
+    if best is None:
+      return None
+    return sorted(best)
+
+  def addindex(self,field):
+    """keep a hash index on the given event and meeting info field"""
+    
+    self.eventindex[field] = {}
+    self.meetindex[field] = {}
+    self.reindex()
+
+  def removeindex(self,field):
+    """stop keeping a hash index on the given field"""
+    
+    del self.eventindex[field]
+    del self.meetindex[field]
+
+  def getindexes(self):
+    """return a list of the indexed fields"""
+    
+    return self.eventindex.keys()
+
+  def reindex(self):
+    """rebuild positions and all indexes from scratch"""
+    
+    self.positions = {}
+    for field in self.eventindex.keys():
+      self.eventindex[field] = {}
+      self.meetindex[field] = {}
+    for (i,eve) in enumerate(self.events):
+      self.indexevent(i,eve)
+
+  def indexevent(self,i,eve):
+    """add the event at index i and all of its meets to the indexes"""
+    
+    self.positions[id(eve)] = i
+    info = eve.getinfo()
+    for (field,index) in self.eventindex.items():
+      if field in info:
+        index.setdefault(info[field],[]).append(i)
+    for j in range(0,len(eve.meets)):
+      self.indexmeet(i,j,eve.meets[j])
+
+  def indexmeet(self,i,j,meet):
+    """add the meet at index (i,j) to the indexes"""
+    
+    info = meet.getinfo()
+    for (field,index) in self.meetindex.items():
+      if field in info:
+        index.setdefault(info[field],[]).append((i,j))
+
+  def meetadded(self,eve,meet):
+    """called by Event.addmeet() when eve in this Schedule gains meet"""
+    
+    self.columns = None
+    if len(self.meetindex)>0:
+      self.indexmeet(self.positions[id(eve)],len(eve.meets)-1,meet)
+    if self.calendar is not None:
+      self.calendar.add(meet,eve)
+
+  def meetsremoved(self,eve):
+    """called by Event.removemeets() when eve in this Schedule loses meets"""
+    
+    self.columns = None
+    if len(self.meetindex)>0:
+      self.reindex()
+    if self.calendar is not None:
+      self.calendar.updateevent(eve)
+
+  def getcalendar(self):
+    """return a calendarindex.CalendarIndex of this Schedule that is
+    kept up to date as events and meetings are added or removed"""
+    
+    if self.calendar is None:
+      self.calendar = calendarindex.CalendarIndex(self)
+    return self.calendar
+
+  def query(self,day=None,start=None,end=None,first=None,last=None,
+      search=None):
+    """return the meetings on day (one of meeting.DAYS) overlapping the
+    dt.times start to end and occuring from the dt.date first to the
+    dt.date last whose info matches search, see CalendarIndex.query(),
+    sorted by day, start time and then their order in getallmeets()"""
+    
+    meets = self.getcalendar().query(day,start,end,first,last)
+    
+    # Narrow down with a hash index on search if there is one
+    if search is not None:
+      candidates = self.lookup(self.meetindex,search)
+      if candidates is not None:
+        ids = set([id(self.events[i].meets[j]) for (i,j) in candidates])
+        meets = [m for m in meets if id(m) in ids]
+      meets = [m for m in meets if matchinfo(m.getinfo(),search)]
+    
+    order = {}
+    for m in meets:
+      if id(m) not in order:
+        i = self.positions[id(m.event)]
+        for (j,meet) in enumerate(self.events[i].meets):
+          order[id(meet)] = (i,j)
+    meets.sort(key=(lambda m: (m.day,m.startmin)+order[id(m)]))
+    return meets
+
+  def getcolumns(self):
+    """return a columnar.Columns cache of all meetings for scans, which
+    is kept until any event or meeting is added or removed and is then
+    made again when next asked for"""
+    
+    if self.columns is None:
+      self.columns = columnar.Columns(self)
+    return self.columns
+
   def addevent(self,eve):
     """add the event to this Schedule"""
   
     if not issubclass(eve.__class__,event.Event):
       raise TypeError('Input must be subclass of Event')
     self.events.append(eve)
+    self.columns = None
+    eve.scheds.append(self)
+    self.indexevent(len(self.events)-1,eve)
+    if self.calendar is not None:
+      self.calendar.addevent(eve)
   
   def addevents(self,events):
     """add the events to this Schedule"""
@@ -99,16 +250,30 @@ class Schedule:
   def removeevents(self,types=None,fields=None,meet=None):
     """remove events that match the search criteria or all if no search"""
     
-    if search is None:
-      self.events = []
+    if (types is None) and (fields is None) and (meet is None):
+      matches = range(0,len(self.events))
     else:
       matches = self.geteventinds(types,fields,meet)
-      matches.sort(reverse=True)
-      for ind in matches:
-        del self.events[ind]
+    matches.sort(reverse=True)
+    for ind in matches:
+      eve = self.events[ind]
+      eve.scheds = [s for s in eve.scheds if s is not self]
+      if self.calendar is not None:
+        self.calendar.removeevent(eve)
+      del self.events[ind]
+    self.columns = None
+    self.reindex()
 
-  def getconflicts(self):
-    """return a list of tuples of conflicting meetings"""
+  def getconflicts(self,engine='sweep'):
+    """return a list of tuples of conflicting meetings using the given
+    engine (one of ENGINES); all engines return the same list"""
+    
+    if engine not in ENGINES:
+      raise ValueError('Unknown conflict engine "'+str(engine)+'"')
+    return getattr(self,'getconflicts'+engine)()
+
+  def getconflictspairwise(self):
+    """return conflicts by checking every pair of meetings"""
     
     conflicts = []
     meets = self.getallmeets()
@@ -119,6 +284,65 @@ class Schedule:
         if meet1.conflicts(meet2):
           conflicts.append((meet1,meet2))
     return conflicts
+
+  def getconflictssweep(self):
+    """return conflicts by sorting each day by start time and sweeping
+    it with a set of active meetings, which is O(n log n + k)"""
+    
+    meets = self.getallmeets()
+    
+    # Bucket (start,end,first,last,index) by day; meetings that end at or
+    # before they start (e.g. at midnight) are not intervals and are
+    # compared directly using Meeting.conflicts() instead
+    days = {}
+    odd = {}
+    for (i,meet) in enumerate(meets):
+      item = (meet.startmin,meet.endmin,meet.startord,meet.endord,i)
+      if meet.startmin<meet.endmin:
+        days.setdefault(meet.day,[]).append(item)
+      else:
+        odd.setdefault(meet.day,[]).append(item)
+    
+    pairs = []
+    for (day,items) in days.items():
+      items.sort()
+      active = []
+      for item in items:
+        (start,end,first,last,i) = item
+        active = [a for a in active if a[1]>start]
+        for a in active:
+          if (a[3]>=first) and (a[2]<=last):
+            pairs.append((min(a[4],i),max(a[4],i)))
+        active.append(item)
+    
+    for (day,items) in odd.items():
+      others = items+days.get(day,[])
+      for item in items:
+        i = item[4]
+        for other in others:
+          j = other[4]
+          if (i!=j) and ((j>i) or (other[0]<other[1])):
+            if meets[min(i,j)].conflicts(meets[max(i,j)]):
+              pairs.append((min(i,j),max(i,j)))
+    
+    pairs.sort()
+    return [(meets[i],meets[j]) for (i,j) in pairs]
+
+  def getconflictscolumnar(self):
+    """return conflicts by sweeping the columns of getcolumns()"""
+    
+    meets = self.getallmeets()
+    return [(meets[i],meets[j]) for (i,j) in self.getcolumns().getconflicts()]
+
+  def getconflictsbitmap(self):
+    """return conflicts using a numpy slot bitmap of all meetings"""
+    
+    return self.getslotmatrix().getconflicts()
+
+  def getslotmatrix(self,packed=False):
+    """return a slotmatrix.SlotMatrix of all meetings (requires numpy)"""
+    
+    return slotmatrix.SlotMatrix(self.getallmeets(),packed)
     
   def getallmeets(self):
     """return a list of all the meets in all my events"""
@@ -129,30 +353,52 @@ class Schedule:
         meets.append(meet)
     return meets
 
+  def occurrences(self,start=None,end=None):
+    """generate (start,end,meet) for each time any meeting occurs from
+    the dt.date start to the dt.date end in order of start time"""
+    
+    return meeting.mergeoccurrences(self.getallmeets(),start,end)
+
   def strf(self,eventfields=None,meetfields=None,sep=' - ',tab='  '):
     """print all events and meets according to params"""
     
+    return ''.join(self.iterstrf(eventfields,meetfields,sep,tab))
+  
+  def iterstrf(self,eventfields=None,meetfields=None,sep=' - ',tab='  '):
+    """generate strf() one line at a time"""
+    
     if eventfields is None:
       eventfields = ['Title']
     if meetfields is None:
       meetfields = ['Day','Start Time','End Time']
     
-    s = ''
+    # Each line drops its last sep and strf() drops its last 2 characters,
+    # so always hold back 2 characters
+    held = ''
     for e in self.events:
-      es = ''
-      for ef in eventfields:
-        if ef in e.info.keys():
-          es += (str(e.getinfo(ef))+sep)
-      s += (es[:-len(sep)]+'\n')
+      info = e.info
+      es = ''.join([str(e.getinfo(ef))+sep for ef in eventfields if ef in info])
+      held += (es[:-len(sep)]+'\n')
       for m in e.meets:
-        ms = tab
-        for mf in meetfields:
-          if mf in m.info.keys():
-            ms += (str(m.getinfo(mf))+sep)
-        s += (ms[:-len(sep)]+'\n')
-    return s[:-2]
+        info = m.info
+        ms = tab+''.join([str(m.getinfo(mf))+sep for mf in meetfields if mf in info])
+        held += (ms[:-len(sep)]+'\n')
+        if len(held)>2:
+          yield held[:-2]
+          held = held[-2:]
+      if len(held)>2:
+        yield held[:-2]
+        held = held[-2:]
 
   def tohtml(self):
     """write the schedule as a pretty and to-scale html table"""
     
     raise NotImplementedError
+
+def matchinfo(info,search):
+  """return whether every field in search has the same value in info"""
+  
+  for key in search.keys():
+    if (key not in info) or (info[key]!=search[key]):
+      return False
+  return True
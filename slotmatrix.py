@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# A bitmap of the 5-minute slots occupied by the meetings in a Schedule,
+# for answering conflict and occupancy questions with matrix operations
+# (Requires numpy)
+#
+# Author: Joshua A Haas
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+import meeting
+
+SLOT = 5
+SLOTS = meeting.MINUTES//SLOT
+
+class SlotMatrix:
+  
+  def __init__(self,meets,packed=False):
+    """rasterize the list of meeting.Meetings into a boolean array of
+    shape (meets,7,SLOTS), stored as packed bits if packed is True"""
+    
+    if np is None:
+      raise ImportError('SlotMatrix requires numpy')
+    
+    self.meets = meets
+    self.packed = packed
+    self.day = np.array([m.day for m in meets],dtype=np.int8)
+    self.start = np.array([m.startmin for m in meets],dtype=np.int16)
+    self.end = np.array([m.endmin for m in meets],dtype=np.int16)
+    self.startord = np.array([m.startord for m in meets],dtype=np.int32)
+    self.endord = np.array([m.endord for m in meets],dtype=np.int32)
+    self.firstord = np.array([m.getfirstord() for m in meets],dtype=np.int32)
+    self.lastord = np.array([m.getlastord() for m in meets],dtype=np.int32)
+    
+    # Meetings that end at or before they start occupy the rest of the day
+    end = np.where(self.end>self.start,self.end,meeting.MINUTES)
+    lo = self.start//SLOT
+    hi = (end+SLOT-1)//SLOT
+    slots = np.arange(SLOTS)
+    rows = (slots>=lo[:,None]) & (slots<hi[:,None])
+    
+    bits = np.zeros((len(meets),7,SLOTS),dtype=bool)
+    bits[np.arange(len(meets)),self.day] = rows
+    if packed:
+      bits = np.packbits(bits,axis=2)
+    self.bits = bits
+  
+  def getbitmap(self,day=None):
+    """return the boolean slot array for all days or just one day"""
+    
+    bits = self.bits
+    if day is not None:
+      bits = bits[:,day:day+1]
+    if self.packed:
+      bits = np.unpackbits(bits,axis=2)[:,:,:SLOTS].astype(bool)
+    if day is not None:
+      return bits[:,0]
+    return bits
+  
+  def getconflicts(self):
+    """return a list of tuples of conflicting meetings, the same as
+    Schedule.getconflicts()"""
+    
+    pairs = []
+    for d in range(0,7):
+      ind = np.nonzero(self.day==d)[0]
+      if len(ind)<2:
+        continue
+      
+      # Candidates share a slot and have overlapping dates
+      rows = self.getbitmap(d)[ind].astype(np.float32)
+      slots = np.dot(rows,rows.T)>0
+      so = self.startord[ind]
+      eo = self.endord[ind]
+      dates = ~((eo[:,None]<so[None,:]) | (so[:,None]>eo[None,:]))
+      (a,b) = np.nonzero(np.triu(slots & dates,1))
+      (i,j) = (ind[a],ind[b])
+      
+      # Slots are coarser than minutes, so check candidates exactly;
+      # meetings ending at or before they start may still be equal
+      s = self.start
+      e = self.end
+      exact = ~((e[i]<=s[j]) | (s[i]>=e[j]))
+      for (x,y,ok) in zip(i.tolist(),j.tolist(),exact.tolist()):
+        if ok or ((s[x]>=e[x]) and (self.meets[x]==self.meets[y])):
+          pairs.append((x,y))
+    
+    pairs.sort()
+    return [(self.meets[i],self.meets[j]) for (i,j) in pairs]
+  
+  def getactive(self,week=None):
+    """return a boolean array of meetings that occur during the week
+    containing the dt.date week, or of all meetings if week is None"""
+    
+    if week is None:
+      return np.ones(len(self.meets),dtype=bool)
+    weekstart = week.toordinal()-week.isoweekday()%7
+    date = weekstart+self.day.astype(np.int32)
+    return (self.firstord<=date) & (self.lastord>=date)
+  
+  def getoccupancy(self,week=None):
+    """return an int array of shape (7,SLOTS) counting the meetings in
+    each slot, limited to the week containing week if specified"""
+    
+    active = self.getactive(week)
+    return self.getbitmap()[active].sum(axis=0)
+  
+  def getbusy(self,week=None):
+    """return a boolean array of shape (7,SLOTS) of occupied slots"""
+    
+    return self.getoccupancy(week)>0
+  
+  def isbusy(self,day,t,week=None):
+    """return whether any meeting occupies the slot containing the
+    dt.time t on the day (one of meeting.DAYS)"""
+    
+    d = meeting.DAYS.index(day)
+    slot = meeting.packtime(t)//SLOT
+    active = self.getactive(week) & (self.day==d)
+    return bool(self.getbitmap(d)[active,slot].any())
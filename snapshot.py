@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+#
+# A compact binary snapshot of a parsed Schedule so it can be reloaded
+# without parsing or validating its sources again
+#
+# Layout (little-endian):
+#   header   MAGIC, VERSION
+#   sources  count, then (path,size,mtime) of each file it was made from
+#   strings  count, then (unicode flag,length,bytes) of each string
+#   events   count, then for each event its class, info fields and meets
+#
+# Strings are stored once and referred to by index. Meetings are stored
+# as their packed slots, see meeting.Meeting.PACKING
+#
+# A snapshot can also be embedded in a text file such as the ascii or html
+# output as base64 lines between EMBED_BEGIN and EMBED_END, or saved next
+# to it as a sidecar (see getsidecar()), so the Schedule can be loaded
+# again from the published files alone
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import os.path,struct,base64
+
+import schedule,event,meeting
+
+MAGIC = 'SCHD'
+VERSION = 1
+EMBED_BEGIN = 'BEGIN SCHEDCONV SNAPSHOT'
+EMBED_END = 'END SCHEDCONV SNAPSHOT'
+EMBED_WIDTH = 76
+SIDECAR_EXT = '.snap'
+
+CLASSES = dict([(cls.__name__,cls) for cls in
+    [event.Event,event.Class,meeting.Meeting,meeting.ClassMeeting]])
+
+HEADER = struct.Struct('<4sH')
+COUNT = struct.Struct('<I')
+SOURCE = struct.Struct('<Iqd')
+STRING = struct.Struct('<BI')
+FIELD = struct.Struct('<Ic')
+VALUES = ({ 'n' : None,
+            's' : struct.Struct('<I'),
+            'i' : struct.Struct('<q'),
+            'f' : struct.Struct('<d'),
+            'd' : struct.Struct('<I') })
+
+def save(sched,fname,sources=None):
+  """write a snapshot of sched made from the files sources to fname"""
+  
+  data = dumps(sched,sources)
+  tmp = fname+'.tmp'
+  f = open(tmp,'wb')
+  try:
+    f.write(data)
+  finally:
+    f.close()
+  os.rename(tmp,fname)
+
+def load(fname,sources=None):
+  """return the Schedule in the snapshot fname, or None if it does not
+  exist, is unreadable or any of the files sources have changed"""
+  
+  try:
+    f = open(fname,'rb')
+    try:
+      data = f.read()
+    finally:
+      f.close()
+    return loads(data,sources)
+  except (IOError,ValueError,KeyError,IndexError,struct.error):
+    return None
+
+def getsources(sources):
+  """return a list of (path,size,mtime) for the files sources"""
+  
+  stats = []
+  for path in sources:
+    path = os.path.abspath(path)
+    if os.path.isfile(path):
+      st = os.stat(path)
+      stats.append((path,st.st_size,st.st_mtime))
+    else:
+      stats.append((path,-1,0.0))
+  return stats
+
+def embed(sched):
+  """return a list of lines holding a snapshot of sched as base64 between
+  EMBED_BEGIN and EMBED_END, which contain no "--" for html comments"""
+  
+  data = base64.b64encode(dumps(sched))
+  lines = [data[i:i+EMBED_WIDTH] for i in range(0,len(data),EMBED_WIDTH)]
+  return [EMBED_BEGIN]+lines+[EMBED_END]
+
+def getsidecar(fname):
+  """return the path of the sidecar snapshot for the output file fname,
+  which replaces its extension with SIDECAR_EXT"""
+  
+  return os.path.splitext(fname)[0]+SIDECAR_EXT
+
+def loadembedded(fname):
+  """return the Schedule embedded by embed() in the text file fname, or
+  None if it has none, reading no further than the end of the snapshot.
+  The markers may have anything before EMBED_BEGIN or after EMBED_END on
+  their lines, and the base64 lines may be indented"""
+  
+  f = open(fname,'rb')
+  try:
+    lines = None
+    for line in f:
+      line = line.strip()
+      if lines is None:
+        if line.endswith(EMBED_BEGIN):
+          lines = []
+      elif line.startswith(EMBED_END):
+        return loads(base64.b64decode(''.join(lines)))
+      else:
+        lines.append(line)
+  finally:
+    f.close()
+  return None
+
+def dumps(sched,sources=None):
+  """return a snapshot of sched as a string of bytes"""
+  
+  strings = Strings()
+  body = []
+  
+  body.append(COUNT.pack(len(sched.events)))
+  for eve in sched.events:
+    info = eve.getinfo()
+    body.append(struct.pack('<II',strings.add(classname(eve)),len(info)))
+    for key in sorted(info.keys()):
+      body.append(packvalue(strings,key,info[key]))
+    
+    body.append(COUNT.pack(len(eve.meets)))
+    for meet in eve.meets:
+      (fmt,slots) = getformat(meet.__class__)
+      values = [strings.add(classname(meet))]
+      for (slot,isstr) in slots:
+        value = getattr(meet,slot)
+        if isstr:
+          value = strings.add(value)
+        values.append(value)
+      body.append(fmt.pack(*values))
+  
+  head = [HEADER.pack(MAGIC,VERSION)]
+  stats = getsources(sources or [])
+  head.append(COUNT.pack(len(stats)))
+  for (path,size,mtime) in stats:
+    head.append(SOURCE.pack(strings.add(path),size,mtime))
+  
+  table = [COUNT.pack(len(strings.strings))]
+  for s in strings.strings:
+    flag = isinstance(s,unicode)
+    if flag:
+      s = s.encode('utf-8')
+    table.append(STRING.pack(flag,len(s)))
+    table.append(s)
+  
+  return ''.join(head+table+body)
+
+def loads(data,sources=None):
+  """return the Schedule in the snapshot string data, or None if any of
+  the files sources have changed since it was made"""
+  
+  (magic,version) = HEADER.unpack_from(data,0)
+  if (magic!=MAGIC) or (version!=VERSION):
+    raise ValueError('Not a version '+str(VERSION)+' schedule snapshot')
+  pos = HEADER.size
+  
+  (count,) = COUNT.unpack_from(data,pos)
+  pos += COUNT.size
+  stats = []
+  for i in range(0,count):
+    stats.append(SOURCE.unpack_from(data,pos))
+    pos += SOURCE.size
+  
+  # Read the string table before checking sources since paths are in it
+  (count,) = COUNT.unpack_from(data,pos)
+  pos += COUNT.size
+  strings = []
+  for i in range(0,count):
+    (flag,length) = STRING.unpack_from(data,pos)
+    pos += STRING.size
+    s = data[pos:pos+length]
+    pos += length
+    if flag:
+      s = s.decode('utf-8')
+    strings.append(meeting.packstr(s))
+  
+  if sources is not None:
+    saved = [(strings[path],size,mtime) for (path,size,mtime) in stats]
+    if saved!=getsources(sources):
+      return None
+  
+  sched = schedule.Schedule()
+  (count,) = COUNT.unpack_from(data,pos)
+  pos += COUNT.size
+  for i in range(0,count):
+    (cls,fields) = struct.unpack_from('<II',data,pos)
+    pos += 8
+    info = {}
+    for j in range(0,fields):
+      (key,value,pos) = unpackvalue(strings,data,pos)
+      info[key] = value
+    eve = CLASSES[strings[cls]](info)
+    
+    (meets,) = COUNT.unpack_from(data,pos)
+    pos += COUNT.size
+    for j in range(0,meets):
+      (cls,) = COUNT.unpack_from(data,pos)
+      cls = CLASSES[strings[cls]]
+      (fmt,slots) = getformat(cls)
+      values = fmt.unpack_from(data,pos)[1:]
+      pos += fmt.size
+      meet = cls.__new__(cls)
+      meet.event = eve
+      for ((slot,isstr),value) in zip(slots,values):
+        if isstr:
+          value = strings[value]
+        setattr(meet,slot,value)
+      eve.meets.append(meet)
+    sched.addevent(eve)
+  
+  return sched
+
+class Strings:
+  """A table of unique strings, each identified by its index"""
+  
+  def __init__(self):
+    """create a new empty table"""
+    
+    self.strings = []
+    self.ids = {}
+  
+  def add(self,s):
+    """return the index of s, adding it to the table if necessary"""
+    
+    key = (type(s),s)
+    if key not in self.ids:
+      self.ids[key] = len(self.strings)
+      self.strings.append(s)
+    return self.ids[key]
+
+FORMATS = {}
+
+def getformat(cls):
+  """return (struct.Struct,[(slot,isstr),...]) for packing the slots of
+  the meeting.Meeting subclass cls"""
+  
+  if cls not in FORMATS:
+    slots = []
+    fmt = '<I'
+    for key in cls.KEYS:
+      (slot,pack,_) = cls.PACKING[key]
+      isstr = pack is meeting.packstr
+      slots.append((slot,isstr))
+      fmt += 'I' if isstr else 'i'
+    FORMATS[cls] = (struct.Struct(fmt),slots)
+  return FORMATS[cls]
+
+def classname(obj):
+  """return the name of obj's class, which must be in CLASSES"""
+  
+  name = obj.__class__.__name__
+  if CLASSES.get(name) is not obj.__class__:
+    raise TypeError('Cannot snapshot objects of class '+name)
+  return name
+
+def packvalue(strings,key,value):
+  """return the bytes for the info field key with value"""
+  
+  if value is None:
+    code = 'n'
+  elif isinstance(value,basestring):
+    code = 's'
+    value = strings.add(value)
+  elif isinstance(value,bool):
+    raise TypeError('Cannot snapshot bool field "'+key+'"')
+  elif isinstance(value,(int,long)):
+    code = 'i'
+  elif isinstance(value,float):
+    code = 'f'
+  elif isinstance(value,dt.date):
+    code = 'd'
+    value = value.toordinal()
+  else:
+    raise TypeError('Cannot snapshot field "'+key+'" of type '+str(type(value)))
+  
+  s = FIELD.pack(strings.add(key),code)
+  if code!='n':
+    s += VALUES[code].pack(value)
+  return s
+
+def unpackvalue(strings,data,pos):
+  """return (key,value,pos) for the info field at pos in data"""
+  
+  (key,code) = FIELD.unpack_from(data,pos)
+  pos += FIELD.size
+  value = None
+  if code!='n':
+    fmt = VALUES[code]
+    (value,) = fmt.unpack_from(data,pos)
+    pos += fmt.size
+    if code=='s':
+      value = strings[value]
+    elif code=='d':
+      value = dt.date.fromordinal(value)
+    elif code=='i':
+      value = int(value)
+  return (strings[key],value,pos)
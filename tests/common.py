@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Shared setup for the tests: puts the package on the path and makes
+# random schedules that exercise the awkward cases (meetings ending at
+# midnight, never occurring, spanning different dates)
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import sys,os.path,random
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schedule,event,meeting
+
+def randomschedule(events,meets=3,seed=0):
+  """return a Schedule of events Events and Classes with up to meets
+  Meetings or ClassMeetings each"""
+  
+  rand = random.Random(seed)
+  sched = schedule.Schedule()
+  for i in range(0,events):
+    if rand.random()<0.5:
+      eve = event.Event({'Title':'Event '+str(i),'Type':'Custom'})
+      kind = meeting.Meeting
+    else:
+      eve = event.Class({'CRN':10000+i,'Course':'ECE '+str(rand.randint(100,499)),
+          'Title':'Course '+str(i),'Campus':'Main','Credits':3.0,
+          'Level':'Undergraduate','Type':'Rowan'})
+      kind = meeting.ClassMeeting
+    for j in range(0,rand.randint(1,meets)):
+      eve.addmeet(kind(randominfo(rand,kind),eve))
+    sched.addevent(eve)
+  return sched
+
+def randominfo(rand,kind):
+  """return a random info dict for a meeting of class kind"""
+  
+  start = dt.date(2015,1,1)+dt.timedelta(rand.randint(0,120))
+  end = start+dt.timedelta(rand.randint(1,120))
+  first = rand.randint(8*12,23*12)*5
+  last = first+rand.choice([30,50,75,110])
+  if rand.random()<0.1:
+    last = 0
+  info = ({'Start Date' : start,
+           'End Date'   : end,
+           'Day'        : rand.choice(meeting.DAYS),
+           'Start Time' : meeting.unpacktime(first),
+           'End Time'   : meeting.unpacktime(min(last,meeting.MINUTES-5)),
+           'Location'   : 'Room '+str(rand.randint(1,20))})
+  if kind is meeting.ClassMeeting:
+    info['Instructor'] = 'Staff '+str(rand.randint(1,5))
+  return info
+
+def describe(sched):
+  """return a list of the classes and info of every event and meeting in
+  sched, for comparing schedules exactly"""
+  
+  return [(eve.__class__.__name__,eve.getinfo(),
+      [(meet.__class__.__name__,meet.getinfo()) for meet in eve.meets])
+      for eve in sched.events]
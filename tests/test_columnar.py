@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Tests Columns.filter() against checking every meeting by brute force
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import unittest,random
+
+import common
+import meeting,columnar
+
+def brute(meets,day,start,end,time,location):
+  """return what Columns.filter() should by checking every meeting"""
+  
+  rows = []
+  for (row,meet) in enumerate(meets):
+    if (day is not None) and (meeting.DAYS[meet.day]!=day):
+      continue
+    if (start is not None) and (meet.endord<start.toordinal()):
+      continue
+    if (end is not None) and (meet.startord>end.toordinal()):
+      continue
+    if time is not None:
+      minute = meeting.packtime(time)
+      stop = meet.endmin
+      if stop<=meet.startmin:
+        stop = meeting.MINUTES
+      if not (meet.startmin<=minute<stop):
+        continue
+    if (location is not None) and (meet.location!=location):
+      continue
+    rows.append(row)
+  return rows
+
+class TestColumnar(unittest.TestCase):
+  
+  def test_filter(self):
+    for seed in range(0,5):
+      sched = common.randomschedule(40,3,seed)
+      meets = sched.getallmeets()
+      store = columnar.Columns(sched)
+      rand = random.Random(seed)
+      for i in range(0,200):
+        day = rand.choice([None]+meeting.DAYS)
+        (start,end) = [rand.choice([None,dt.date(2015,1,1)+dt.timedelta(rand.randint(0,250))])
+            for j in range(0,2)]
+        time = rand.choice([None,dt.time(rand.randint(0,23),rand.choice([0,30]))])
+        location = rand.choice([None,'Room '+str(rand.randint(1,20))])
+        args = (day,start,end,time,location)
+        self.assertEqual(store.filter(day=day,start=start,end=end,time=time,
+            location=location),brute(meets,*args),args)
+  
+  def test_midnight(self):
+    sched = common.randomschedule(80,3,1)
+    meets = sched.getallmeets()
+    store = columnar.Columns(sched)
+    late = [row for (row,meet) in enumerate(meets) if meet.endmin==0]
+    self.assertTrue(len(late)>0)
+    found = store.filter(time=dt.time(23,55))
+    self.assertEqual(found,brute(meets,None,None,None,dt.time(23,55),None))
+    self.assertTrue(all([row in found for row in late]))
+
+if __name__=='__main__':
+  unittest.main()
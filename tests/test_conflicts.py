@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+#
+# Tests that every conflict engine finds the same conflicts
+#
+# Author: Joshua A Haas
+
+import unittest
+
+import common
+import schedule
+
+class TestConflicts(unittest.TestCase):
+  
+  def check(self,sched):
+    """assert every engine gives the pairwise result for sched"""
+    
+    expected = [(id(a),id(b)) for (a,b) in sched.getconflicts('pairwise')]
+    for engine in schedule.ENGINES:
+      found = [(id(a),id(b)) for (a,b) in sched.getconflicts(engine)]
+      self.assertEqual(found,expected,engine)
+    return expected
+  
+  def test_random(self):
+    for seed in range(0,20):
+      self.check(common.randomschedule(30,3,seed))
+  
+  def test_dense(self):
+    self.assertTrue(len(self.check(common.randomschedule(120,4,1)))>0)
+  
+  def test_empty(self):
+    self.assertEqual(self.check(schedule.Schedule()),[])
+  
+  def test_changed(self):
+    sched = common.randomschedule(40,3,2)
+    self.check(sched)
+    sched.removeevents(fields={'Title':sched.events[3].getinfo('Title')})
+    sched.events[0].removemeets({'Day':sched.events[0].meets[0].getinfo('Day')})
+    self.check(sched)
+  
+  def test_unknown(self):
+    self.assertRaises(ValueError,schedule.Schedule().getconflicts,'nope')
+
+if __name__=='__main__':
+  unittest.main()
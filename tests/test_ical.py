@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# Tests that iCalendar files written by ical.write() read back as the same
+# weekly meetings and are the same bytes every time
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import unittest,tempfile,shutil,os.path
+
+import common
+import ical
+
+def occurring(sched):
+  """return a sorted list describing each meeting of sched that occurs"""
+  
+  found = []
+  for eve in sched.events:
+    for meet in eve.meets:
+      if meet.getnummeets()>0:
+        found.append((eve.getinfo('Title'),meet.getinfo('Day'),
+            meet.getfirstmeet(),meet.getlastmeet(),meet.getinfo('Start Time'),
+            meet.getinfo('End Time'),meet.getinfo('Location')))
+  return sorted(found)
+
+class TestIcal(unittest.TestCase):
+  
+  def setUp(self):
+    self.tmp = tempfile.mkdtemp()
+    self.fname = os.path.join(self.tmp,'sched.ics')
+  
+  def tearDown(self):
+    shutil.rmtree(self.tmp)
+  
+  def roundtrip(self,sched):
+    """write sched, read it back and return (Schedule,skipped)"""
+    
+    ical.write(sched,self.fname)
+    return ical.read(self.fname)
+  
+  def test_roundtrip(self):
+    for seed in range(0,10):
+      sched = common.randomschedule(20,3,seed)
+      (loaded,skipped) = self.roundtrip(sched)
+      self.assertEqual(skipped,[])
+      self.assertEqual(occurring(loaded),occurring(sched))
+  
+  def test_escaped(self):
+    sched = common.randomschedule(1,1,1)
+    title = 'Lab; with, commas\\ and a newline\nand '+'x'*100
+    sched.events[0].importinfo({'Title':title})
+    (loaded,skipped) = self.roundtrip(sched)
+    self.assertEqual(loaded.events[0].getinfo('Title'),title)
+    for line in open(self.fname,'rb'):
+      self.assertTrue(len(line)<=77)
+  
+  def test_stable(self):
+    sched = common.randomschedule(20,3,2)
+    ical.write(sched,self.fname)
+    first = open(self.fname,'rb').read()
+    ical.write(sched,self.fname)
+    self.assertEqual(open(self.fname,'rb').read(),first)
+    ical.write(sched,self.fname,dt.datetime(2015,1,1))
+    self.assertNotEqual(open(self.fname,'rb').read(),first)
+  
+  def test_skipped(self):
+    f = open(self.fname,'wb')
+    f.write('BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:Monthly\r\n'
+        +'DTSTART:20240105T090000\r\nDTEND:20240105T100000\r\n'
+        +'RRULE:FREQ=MONTHLY\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n')
+    f.close()
+    (loaded,skipped) = ical.read(self.fname)
+    self.assertEqual(loaded.events,[])
+    self.assertEqual([summary for (summary,reason) in skipped],['Monthly'])
+
+if __name__=='__main__':
+  unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+# Tests Schedule.query() against checking every meeting by brute force
+#
+# Author: Joshua A Haas
+
+import datetime as dt
+import unittest,random
+
+import common
+import schedule,meeting
+from intervaltree import IntervalTree
+
+def brute(sched,day,start,end,first,last,search):
+  """return what Schedule.query() should by checking every meeting"""
+  
+  found = []
+  for (pos,meet) in enumerate(sched.getallmeets()):
+    if meet.getnummeets()==0:
+      continue
+    if (day is not None) and (meeting.DAYS[meet.day]!=day):
+      continue
+    if (start is not None) or (end is not None):
+      stop = meet.endmin
+      if stop<=meet.startmin:
+        stop = meeting.MINUTES
+      if end is None:
+        (lo,hi) = (meeting.packtime(start),meeting.packtime(start)+1)
+      else:
+        lo = 0
+        if start is not None:
+          lo = meeting.packtime(start)
+        hi = meeting.packtime(end)
+        if hi<=lo:
+          hi = meeting.MINUTES
+      if (meet.startmin>=hi) or (stop<=lo):
+        continue
+    if (first is not None) or (last is not None) or ((start is None) and (end is None)):
+      if next(meet.occurrences(first,last),None) is None:
+        continue
+    if (search is not None) and (not schedule.matchinfo(meet.getinfo(),search)):
+      continue
+    found.append((meet.day,meet.startmin,pos,meet))
+  found.sort()
+  return [meet for (d,m,p,meet) in found]
+
+class TestQuery(unittest.TestCase):
+  
+  def check(self,sched,seed,count=200):
+    """assert random queries of sched match brute()"""
+    
+    rand = random.Random(seed)
+    for i in range(0,count):
+      day = rand.choice([None]+meeting.DAYS)
+      (start,end) = [rand.choice([None,dt.time(rand.randint(0,23),rand.choice([0,30]))])
+          for j in range(0,2)]
+      (first,last) = [rand.choice([None,dt.date(2015,1,1)+dt.timedelta(rand.randint(0,250))])
+          for j in range(0,2)]
+      search = rand.choice([None,{'Location':'Room '+str(rand.randint(1,20))}])
+      args = (day,start,end,first,last,search)
+      self.assertEqual([id(m) for m in sched.query(*args)],
+          [id(m) for m in brute(sched,*args)],args)
+  
+  def test_random(self):
+    for seed in range(0,5):
+      self.check(common.randomschedule(40,3,seed),seed)
+  
+  def test_indexed(self):
+    sched = schedule.Schedule(common.randomschedule(40,3,6).events,['Location'])
+    self.check(sched,6)
+  
+  def test_changed(self):
+    sched = common.randomschedule(40,3,7)
+    sched.query()
+    sched.removeevents(fields={'Title':sched.events[3].getinfo('Title')})
+    sched.events[0].removemeets({'Day':sched.events[0].meets[0].getinfo('Day')})
+    eve = sched.events[1]
+    kind = eve.meets[0].__class__
+    eve.addmeet(kind(common.randominfo(random.Random(7),kind),eve))
+    self.check(sched,7)
+  
+  def test_count(self):
+    rand = random.Random(8)
+    tree = IntervalTree()
+    items = [object() for i in range(0,200)]
+    for item in items:
+      lo = rand.randint(0,100)
+      tree.insert(lo,lo+rand.randint(0,20),item)
+    for item in items[::3]:
+      tree.remove(item)
+    for i in range(0,200):
+      lo = rand.randint(-10,130)
+      hi = lo+rand.randint(0,30)
+      self.assertEqual(tree.count(lo,hi),len(tree.overlap(lo,hi)),(lo,hi))
+
+if __name__=='__main__':
+  unittest.main()
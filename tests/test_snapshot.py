@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#
+# Tests that snapshots load back the Schedule they were made from
+#
+# Author: Joshua A Haas
+
+import unittest,tempfile,shutil,os.path
+
+import common
+import schedule,snapshot
+
+class TestSnapshot(unittest.TestCase):
+  
+  def setUp(self):
+    self.tmp = tempfile.mkdtemp()
+  
+  def tearDown(self):
+    shutil.rmtree(self.tmp)
+  
+  def test_roundtrip(self):
+    for seed in range(0,10):
+      sched = common.randomschedule(20,3,seed)
+      loaded = snapshot.loads(snapshot.dumps(sched))
+      self.assertEqual(common.describe(loaded),common.describe(sched))
+  
+  def test_empty(self):
+    loaded = snapshot.loads(snapshot.dumps(schedule.Schedule()))
+    self.assertEqual(loaded.events,[])
+  
+  def test_unicode(self):
+    sched = common.randomschedule(3,2,1)
+    sched.events[0].meets[0].importinfo({'Location':u'Caf\xe9'})
+    loaded = snapshot.loads(snapshot.dumps(sched))
+    self.assertEqual(loaded.events[0].meets[0].getinfo('Location'),u'Caf\xe9')
+  
+  def test_sources(self):
+    source = os.path.join(self.tmp,'rowan.html')
+    fname = os.path.join(self.tmp,'sched.snap')
+    open(source,'w').write('old')
+    sched = common.randomschedule(5,2,3)
+    snapshot.save(sched,fname,[source])
+    self.assertEqual(common.describe(snapshot.load(fname,[source])),
+        common.describe(sched))
+    open(source,'w').write('changed')
+    self.assertEqual(snapshot.load(fname,[source]),None)
+  
+  def test_unreadable(self):
+    fname = os.path.join(self.tmp,'sched.snap')
+    self.assertEqual(snapshot.load(fname),None)
+    open(fname,'w').write('garbage')
+    self.assertEqual(snapshot.load(fname),None)
+  
+  def test_embedded(self):
+    sched = common.randomschedule(10,3,4)
+    fname = os.path.join(self.tmp,'sched.html')
+    lines = snapshot.embed(sched)
+    f = open(fname,'w')
+    f.write('<html>\n<!-- '+lines[0]+'\n'+'\n'.join(lines[1:-1])+'\n'+lines[-1]+' -->\n</html>\n')
+    f.close()
+    self.assertTrue(all(['--' not in line for line in lines]))
+    self.assertEqual(common.describe(snapshot.loadembedded(fname)),
+        common.describe(sched))
+  
+  def test_sidecar(self):
+    sched = common.randomschedule(10,3,5)
+    fname = os.path.join(self.tmp,'sched.html')
+    sidecar = snapshot.getsidecar(fname)
+    self.assertEqual(sidecar,os.path.join(self.tmp,'sched'+snapshot.SIDECAR_EXT))
+    snapshot.save(sched,sidecar)
+    self.assertEqual(common.describe(snapshot.load(sidecar)),common.describe(sched))
+  
+  def test_notembedded(self):
+    fname = os.path.join(self.tmp,'sched-ascii.txt')
+    open(fname,'w').write('no snapshot here\n')
+    self.assertEqual(snapshot.loadembedded(fname),None)
+
+if __name__=='__main__':
+  unittest.main()